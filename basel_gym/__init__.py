@@ -1,2 +1,3 @@
 from basel_gym.basel_base import *
 from basel_gym.basel_simple import *
+from basel_gym.basel_vector import *
@@ -102,6 +102,12 @@ class BaselBase(gym.Env):
         self.np_random, seed = seeding.np_random(seed)
         return [seed]
 
+    def _randint(self, low: int, high: int) -> int:
+        '''Draws an integer in [low, high), np_random being a RandomState (gym < 0.22) or a Generator.'''
+        np_random = self.np_random
+
+        return int(np_random.integers(low, high) if hasattr(np_random, "integers") else np_random.randint(low, high))
+
     def step(self, action):
         self.action_value = self._getActionValue(action)
         self._updateEnvironment()
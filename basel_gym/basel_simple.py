@@ -1,7 +1,7 @@
 from math import sqrt
 
-from basel_base import BaselBase
-from basel_base import EventTransition
+from basel_gym.basel_base import BaselBase
+from basel_gym.basel_base import EventTransition
 
 from gym import spaces
 
@@ -44,10 +44,10 @@ class BaselSimple(BaselBase):
         return reward
 
     def reset(self):
-        current_kmul_index = self.defaultMultiplierIndex if self.defaultMultiplierIndex is not None else self.np_random.randint(
+        current_kmul_index = self.defaultMultiplierIndex if self.defaultMultiplierIndex is not None else self._randint(
             0, self._kMultipliersMaxIndex)
 
-        initialECs = self.np_random.randint(0, self._EC_Max - 1) if self._useRandomEC else 0
+        initialECs = self._randint(0, self._EC_Max - 1) if self._useRandomEC else 0
         self.state = (250 - initialECs, initialECs , current_kmul_index)
         
         self._is_bankrupt = False
@@ -0,0 +1,273 @@
+import ctypes
+import multiprocessing as mp
+import traceback
+
+import numpy as np
+
+from basel_gym.basel_base import PseudoRandomNumberQueue
+from basel_gym.basel_simple import BaselSimple
+
+# Worker commands, sent as raw bytes so that stepping never pickles anything
+_STEP = b"s"
+_RESET = b"r"
+_CLOSE = b"c"
+_DONE = b"d"
+_ERROR = b"e"
+
+def _sharedArray(context, shape: tuple, dtype) -> tuple:
+    '''Allocates a lock-free shared buffer, returned with the (shape, dtype) needed to view it as an array.'''
+    dtype = np.dtype(dtype)
+    raw = context.RawArray(ctypes.c_byte, max(int(np.prod(shape)) * dtype.itemsize, 1))
+
+    return raw, tuple(shape), dtype.str
+
+def _viewArray(shared: tuple) -> np.ndarray:
+    raw, shape, dtype = shared
+
+    return np.frombuffer(raw, dtype=np.dtype(dtype), count=int(np.prod(shape))).reshape(shape)
+
+def _runWorker(conn, env_class, env_config: dict, env_indices: range, seed: int, random_queue_size: int,
+        observations, rewards, dones, actions, terminal_observations) -> None:
+    '''Hosts the envs env_indices, stepping them on the main process' commands and writing onto the shared buffers.'''
+    try:
+        observations, rewards, dones, actions, terminal_observations = (_viewArray(shared) for shared in
+            (observations, rewards, dones, actions, terminal_observations))
+
+        if seed is not None:
+            np.random.seed(seed + env_indices.start)
+
+        # The envs draw their events from the global random stream, so that a single queue serves all of them
+        random_queue = PseudoRandomNumberQueue(random_queue_size)
+        envs = []
+
+        for env_index in env_indices:
+            env = env_class(env_config)
+            env._rndGenerator = random_queue
+
+            if seed is not None:
+                env.seed(seed + env_index)
+
+            envs.append(env)
+    except Exception:
+        conn.send_bytes(_ERROR + traceback.format_exc().encode())
+        conn.close()
+        return
+
+    conn.send_bytes(_DONE)
+
+    while True:
+        try:
+            command = conn.recv_bytes()
+        except EOFError:
+            break
+
+        if command == _CLOSE:
+            break
+
+        try:
+            if command == _STEP:
+                for env_index, env in zip(env_indices, envs):
+                    observation, reward, done, _ = env.step(actions[env_index])
+
+                    if done:
+                        terminal_observations[env_index] = observation
+                        observation = env.reset()
+
+                    observations[env_index] = observation
+                    rewards[env_index] = reward
+                    dones[env_index] = done
+            elif command == _RESET:
+                for env_index, env in zip(env_indices, envs):
+                    observations[env_index] = env.reset()
+                    dones[env_index] = False
+            else:
+                raise ValueError("basel_vector:_runWorker Unknown command {}.".format(command))
+
+            conn.send_bytes(_DONE)
+        except Exception:
+            conn.send_bytes(_ERROR + traceback.format_exc().encode())
+
+    conn.close()
+
+class BaselVectorEnv(object):
+    '''Steps many copies of a Basel environment on worker processes.
+
+    Each worker hosts a contiguous block of envs, so that a single command steps all of them. Actions,
+    observations, rewards and done flags are exchanged through shared memory buffers, and commands
+    through single-byte messages, so that nothing is pickled while stepping.
+
+    Envs are reset as soon as they are done: the returned observation is then the reset one, and the
+    episode's last observation is held in terminal_observations.
+
+    Parameters
+    ----------
+    config : dict
+        num_envs : int
+            The number of envs.
+        workers : int, optional
+            The number of worker processes, by default the number of CPUs (up to num_envs).
+        env_class : optional
+            The Basel environment class, by default BaselSimple.
+        env_config : dict, optional
+            The configuration every env is constructed with, by default {}.
+        seed : int, optional
+            The envs' seeds are seed + env index, and the workers' random streams seed + their first env index.
+        random_queue_size : int, optional
+            The size of the random number batches drawn by each worker's shared PseudoRandomNumberQueue, by default 100000.
+        start_method : str, optional
+            The multiprocessing start method, by default "spawn".
+        copy : bool, optional
+            Whether step and reset return copies of the shared buffers, by default True.
+    '''
+
+    def __init__(self, config: dict):
+        self._num_envs: int = config.get("num_envs", 0)
+
+        if self._num_envs < 1:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid num_envs {}.".format(self._num_envs))
+
+        self._env_class = config.get("env_class", BaselSimple)
+        self._env_config: dict = config.get("env_config", {})
+        self._copy: bool = config.get("copy", True)
+        self._closed: bool = False
+        self._waiting: bool = False
+
+        workers = min(config.get("workers", None) or mp.cpu_count(), self._num_envs)
+
+        # a probe env provides the spaces, without drawing any random number
+        probe_env = self._env_class(self._env_config)
+        self.observation_space = probe_env.observation_space
+        self.action_space = probe_env.action_space
+
+        context = mp.get_context(config.get("start_method", "spawn"))
+        observation_shape = (self._num_envs, ) + tuple(self.observation_space.shape)
+        shared = [
+            _sharedArray(context, observation_shape, self.observation_space.dtype),
+            _sharedArray(context, (self._num_envs, ), np.float64),
+            _sharedArray(context, (self._num_envs, ), np.bool_),
+            _sharedArray(context, (self._num_envs, ) + tuple(self.action_space.shape), self.action_space.dtype),
+            _sharedArray(context, observation_shape, self.observation_space.dtype)]
+
+        self._observations, self._rewards, self._dones, self._actions, self._terminal_observations = \
+            (_viewArray(buffer) for buffer in shared)
+
+        self._connections = []
+        self._processes = []
+        bounds = np.linspace(0, self._num_envs, workers + 1).astype(int)
+
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_runWorker, daemon=True, args=(child_conn, self._env_class, self._env_config,
+                range(start, stop), config.get("seed", None), config.get("random_queue_size", 100000), *shared))
+            process.start()
+            child_conn.close()
+
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+        try:
+            self._waitWorkers()
+        except Exception:
+            self.close()
+            raise
+
+    def _sendWorkers(self, command: bytes) -> None:
+        if self._closed:
+            raise ValueError(self.__class__.__name__, ":_sendWorkers Environment closed.")
+
+        for conn in self._connections:
+            conn.send_bytes(command)
+
+    def _waitWorkers(self) -> None:
+        '''Waits for every worker's reply, raising the first worker error if any.'''
+        errors = []
+
+        for conn in self._connections:
+            reply = conn.recv_bytes()
+
+            if reply[:1] == _ERROR:
+                errors.append(reply[1:].decode())
+
+        if errors:
+            raise RuntimeError(self.__class__.__name__, ":_waitWorkers Worker failed.\n" + errors[0])
+
+    def _output(self, array: np.ndarray) -> np.ndarray:
+        return array.copy() if self._copy else array
+
+    def reset(self) -> np.ndarray:
+        '''Resets every env, returning the (num_envs, *observation shape) observations.'''
+        self._sendWorkers(_RESET)
+        self._waitWorkers()
+
+        return self._output(self._observations)
+
+    def step_async(self, actions) -> None:
+        '''Writes the actions onto the shared buffer and starts stepping the envs.'''
+        if self._waiting:
+            raise ValueError(self.__class__.__name__, ":step_async A step is already in progress.")
+
+        np.copyto(self._actions, np.asarray(actions).reshape(self._actions.shape), casting="unsafe")
+        self._sendWorkers(_STEP)
+        self._waiting = True
+
+    def step_wait(self) -> tuple:
+        '''Waits for the step started by step_async.
+
+        Returns
+        -------
+        tuple
+            The (observations, rewards, dones, infos), infos being empty dicts.
+        '''
+        if not self._waiting:
+            raise ValueError(self.__class__.__name__, ":step_wait No step in progress.")
+
+        self._waiting = False
+        self._waitWorkers()
+
+        return self._output(self._observations), self._output(self._rewards), self._output(self._dones), \
+            [{} for _ in range(self._num_envs)]
+
+    def step(self, actions) -> tuple:
+        self.step_async(actions)
+
+        return self.step_wait()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+
+        for conn in self._connections:
+            try:
+                conn.send_bytes(_CLOSE)
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self._processes:
+            process.join(timeout=5)
+
+            if process.is_alive():
+                process.terminate()
+
+        for conn in self._connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
+
+    @property
+    def num_envs(self) -> int:
+        return self._num_envs
+
+    @property
+    def terminal_observations(self) -> np.ndarray:
+        '''The last observation of the envs whose episode ended on the last step, see dones.'''
+        return self._output(self._terminal_observations)
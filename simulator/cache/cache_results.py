@@ -0,0 +1,149 @@
+from typing import Dict, Optional
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+class SimulationResultCache(object):
+    '''Content-addressed, size-bounded cache of simulation records.
+
+    Entries are stored as .npz files named after their key, and evicted in least-recently-used
+    order whenever the directory grows above max_size.
+
+    Parameters
+    ----------
+    directory : str
+        The cache directory, created if missing.
+    max_size : int, optional
+        The maximum size of the cache, in bytes. Defaults to 1 GiB.
+    '''
+
+    EXTENSION = ".npz"
+
+    def __init__(self, directory: str, max_size: int = 1 << 30):
+        if directory is None:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid cache directory.")
+
+        if not max_size > 0:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid max_size {}.".format(max_size))
+
+        self._directory: str = directory
+        self._max_size: int = max_size
+
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(config: dict, arrays: Dict[str, np.ndarray] = {}) -> str:
+        '''Computes the content address of a configuration and the arrays it depends on.
+
+        Parameters
+        ----------
+        config : dict
+            A JSON-serializable configuration. Key order is irrelevant.
+        arrays : Dict[str, np.ndarray], optional
+            Arrays hashed by content (dtype, shape and data), e.g. policy tables.
+
+        Returns
+        -------
+        str
+            The hexadecimal sha256 digest.
+        '''
+        sha = hashlib.sha256(json.dumps(config, sort_keys=True, separators=(',', ':')).encode("utf-8"))
+
+        for name in sorted(arrays):
+            array = np.ascontiguousarray(arrays[name])
+            sha.update(name.encode("utf-8"))
+            sha.update(array.dtype.str.encode("utf-8"))
+            sha.update(repr(array.shape).encode("utf-8"))
+            sha.update(array.tobytes())
+
+        return sha.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self._directory, key + SimulationResultCache.EXTENSION)
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        '''Retrieves the records stored under key, None on a miss.'''
+        path = self.path(key)
+
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                records = {name: stored[name] for name in stored.files}
+        except (OSError, ValueError):
+            return None
+
+        # refresh the entry's recency for the LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return records
+
+    def put(self, key: str, records: Dict[str, np.ndarray]) -> str:
+        '''Stores records under key, evicting the least recently used entries if needed.
+
+        Returns
+        -------
+        str
+            The path of the stored entry.
+        '''
+        path = self.path(key)
+        handle, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(handle, "wb") as tmp_file:
+                np.savez(tmp_file, **records)
+
+            # atomic, so concurrent readers never see partial entries
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict(keep=path)
+
+        return path
+
+    def evict(self, keep: str = None) -> None:
+        '''Removes the least recently used entries until the cache fits max_size.'''
+        entries = []
+
+        with os.scandir(self._directory) as scan:
+            for entry in scan:
+                if entry.is_file() and entry.name.endswith(SimulationResultCache.EXTENSION):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+
+            if path == keep:
+                continue
+
+            try:
+                os.remove(path)
+                total_size -= size
+                logging.debug("SimulationResultCache:evict Removed {}".format(path))
+            except OSError:
+                pass
+
+    def size(self) -> int:
+        with os.scandir(self._directory) as scan:
+            return sum(entry.stat().st_size for entry in scan if entry.name.endswith(SimulationResultCache.EXTENSION))
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
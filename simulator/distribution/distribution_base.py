@@ -30,4 +30,27 @@ class SimulationDistributionBase(object):
         self._dist = distribution
 
     def getAction(self, observation: np.array) -> float:
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def getActionInto(self, observation, out: np.ndarray, indices: np.ndarray = None) -> np.ndarray:
+        '''Writes the action(s) for the supplied observation components into a pre-allocated array.
+
+        Falls back on getAction by default. Subclasses may override it to avoid allocations.
+
+        Parameters
+        ----------
+        observation : Sequence[np.ndarray]
+            One array (or scalar) per observation dimension.
+        out : np.ndarray
+            The array receiving the actions.
+        indices : np.ndarray, optional
+            Integer scratch space, for implementations relying on it.
+
+        Returns
+        -------
+        np.ndarray
+            out
+        '''
+        out[...] = self.getAction(np.vstack(np.broadcast_arrays(*observation)))
+
+        return out
\ No newline at end of file
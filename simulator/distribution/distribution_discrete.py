@@ -1,14 +1,22 @@
 from typing import Callable
 from utils.utils_decorators import inputDecorators
-from utils.utils_distribution import convertToRowMajor
+from utils.utils_distribution import convertToRowMajor, convertToRowMajorInto
 
 import numpy as np
 
 from simulator.distribution.distribution_base import SimulationDistributionBase
 
 class DiscreteSimulationDistribution(SimulationDistributionBase):
+    '''Discrete (tabular) distribution, mapping observations onto actions.
+
+    Setting "policy_stack" holds a stack of K policy tables instead, the first axis of the distribution
+    function indexing the policy, so that K policies are evaluated with a single lookup. The distribution
+    function may then also be supplied as a sequence of equally shaped tables.
+    '''
 
     def __init__(self, config={}):
+        self._policy_stack: bool = config.get("policy_stack", False)
+
         super().__init__(config)
 
     @property
@@ -27,10 +35,23 @@ class DiscreteSimulationDistribution(SimulationDistributionBase):
     @distributionFunction.setter
     @inputDecorators.non_null
     def distributionFunction(self, distribution: np.array) -> None:
+        if self._policy_stack and isinstance(distribution, (list, tuple)):
+            distribution = np.stack(distribution)
+
         super(DiscreteSimulationDistribution, self.__class__).distributionFunction.fset(self, distribution)
 
         self._dist_raveled = distribution.ravel()
 
+    @property
+    def policyCount(self) -> int:
+        '''The number of stacked policies, None if the distribution holds a single policy.'''
+        return self._dist.shape[0] if self._policy_stack else None
+
+    @property
+    def raveledDistributionFunction(self) -> np.array:
+        '''Retrieves the row-major raveled view of the underlying distribution function.'''
+        return self._dist_raveled
+
     @inputDecorators.non_null
     def getAction(self, observation: np.ndarray) -> np.array:
         '''Retrieves action(s) for the supplied observation(s)
@@ -48,4 +69,28 @@ class DiscreteSimulationDistribution(SimulationDistributionBase):
         '''
         indices = convertToRowMajor(observation, self._dist.shape)
  
-        return self._dist_raveled[indices]
\ No newline at end of file
+        return self._dist_raveled[indices]
+
+    def getActionInto(self, observation, out: np.ndarray, indices: np.ndarray = None) -> np.ndarray:
+        '''Writes the action(s) for the supplied observation components into a pre-allocated array.
+
+        Parameters
+        ----------
+        observation : Sequence[np.ndarray]
+            One array (or scalar) per distribution dimension, e.g. (k_indices, exceedances, ttob).
+        out : np.ndarray
+            The array receiving the actions.
+        indices : np.ndarray, optional
+            Integer (np.intp) scratch space for the raveled indices, allocated if not supplied.
+
+        Returns
+        -------
+        np.ndarray
+            out
+        '''
+        if indices is None:
+            indices = np.empty(out.shape, dtype=np.intp)
+
+        convertToRowMajorInto(observation, self._dist.shape, indices)
+
+        return np.take(self._dist_raveled, indices, out=out)
\ No newline at end of file
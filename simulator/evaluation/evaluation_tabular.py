@@ -0,0 +1,195 @@
+from math import sqrt
+
+import numpy as np
+
+from scipy.special import ndtr
+from scipy.stats import norm
+
+from simulator.distribution.distribution_discrete import DiscreteSimulationDistribution
+
+SQRT_10 = sqrt(10)
+
+class TabularPolicyEvaluator(object):
+    '''Exactly evaluates policy tables under the BaselSimple (basel_gym) dynamics.
+
+    The environment's state (ttob, ec_number, k_mul) is finite and its transitions are closed-form, so
+    rather than sampling episodes the evaluator pushes the whole state distribution through the year,
+    one day per step. States sharing their time to backtesting are stepped together, and so are the
+    policies of a policy stack, making an evaluation a few hundred small array operations.
+
+    Policy tables are indexed as the simulator's, by (k_mul, ec_number, days elapsed), the days
+    elapsed being 250 - ttob, and hold the disclosed value as a percentage of VaR.
+
+    Parameters
+    ----------
+    config : dict
+        initial_distribution : np.ndarray, optional
+            The (251, 12, 8) probabilities of the initial (ttob, ec_number, k_mul) states, by default those
+            of BaselSimple.reset (uniform ec_number in [0, 10), ttob = 250 - ec_number, uniform k_mul in [0, 7)).
+        confidence_level : float, optional
+            The VaR's confidence level, by default 0.99.
+    '''
+
+    # as in basel_gym.basel_base.BaselBase
+    EC_MAX = 11
+    K_MULTIPLIERS = np.array([3, 3.4, 3.5, 3.65, 3.75, 3.85, 4, np.inf])
+    K_MULTIPLIERS_REWARD = np.array([0.01, 0.015, 0.02, 0.032, 0.037, 0.042, 0.0495, 0])
+    K_MAX_INDEX = len(K_MULTIPLIERS) - 1
+    DAYS = 250
+    # BaselSimple's reward per unit of action value, k_mul and 10-day VaR
+    REWARD_SCALE = 0.00001
+
+    def __init__(self, config: dict = {}):
+        confidence_level: float = config.get("confidence_level", 0.99)
+
+        self._normal_var: float = norm.ppf(confidence_level, 0, 1)
+        self._normal_var10: float = -self._normal_var * SQRT_10
+
+        initial_distribution: np.ndarray = config.get("initial_distribution", None)
+
+        if initial_distribution is None:
+            initial_distribution = self._resetDistribution()
+
+        self._setInitialDistribution(np.asarray(initial_distribution, dtype=float))
+
+        # the k_mul every ec_number maps onto at the yearly review
+        ec_numbers = np.arange(self.EC_MAX)
+        self._review_k: np.ndarray = np.where(ec_numbers <= 4, 0, ec_numbers - 4)
+
+    def _resetDistribution(self) -> np.ndarray:
+        '''The initial state distribution of BaselSimple.reset.'''
+        distribution = np.zeros((self.DAYS + 1, self.EC_MAX + 1, self.K_MAX_INDEX + 1))
+
+        for ec_number in range(self.EC_MAX - 1):
+            distribution[self.DAYS - ec_number, ec_number, :self.K_MAX_INDEX] = 1 / ((self.EC_MAX - 1) * self.K_MAX_INDEX)
+
+        return distribution
+
+    def _setInitialDistribution(self, distribution: np.ndarray) -> None:
+        if distribution.shape != (self.DAYS + 1, self.EC_MAX + 1, self.K_MAX_INDEX + 1):
+            raise ValueError(self.__class__.__name__, ":_setInitialDistribution Invalid initial distribution shape {}.".format(distribution.shape))
+
+        if (distribution < 0).any() or not np.isclose(distribution.sum(), 1):
+            raise ValueError(self.__class__.__name__, ":_setInitialDistribution The initial distribution must sum to 1.")
+
+        # bankrupt and terminal states are absorbing, the episode would be over before any step
+        if distribution[0].any() or distribution[:, self.EC_MAX].any() or distribution[:, :, self.K_MAX_INDEX].any():
+            raise ValueError(self.__class__.__name__, ":_setInitialDistribution The initial distribution holds terminal states.")
+
+        # states are grouped by their time to backtesting, every group stepping in lockstep
+        self._group_ttobs: np.ndarray = np.flatnonzero(distribution.sum(axis=(1, 2)))
+        self._initial_mass: np.ndarray = distribution[self._group_ttobs][:, :self.EC_MAX, :self.K_MAX_INDEX]
+
+    def evaluatePolicy(self, policy) -> dict:
+        '''Evaluates a policy table, or a stack of them.
+
+        Parameters
+        ----------
+        policy : DiscreteSimulationDistribution or np.ndarray
+            The (8, 12, 250) policy table, or a (policies, 8, 12, 250) stack of them, e.g. a
+            DiscreteSimulationDistribution with "policy_stack" set.
+
+        Returns
+        -------
+        dict
+            expected_reward : the expected undiscounted episode reward.
+            bankruptcy_probability : the probability of the episode ending in bankruptcy.
+            multiplier_distribution : the (8, ) probabilities of the episode's last k_mul, bankruptcy being k_mul 7.
+            exceedance_distribution : the (12, ) probabilities of the episode's last ec_number, bankruptcy being 11.
+
+            The values gain a leading policy axis when evaluating a stack of policies.
+        '''
+        if isinstance(policy, DiscreteSimulationDistribution):
+            policy_stack = policy.policyCount is not None
+            table = np.asarray(policy.distributionFunction, dtype=float)
+        else:
+            table = np.asarray(policy, dtype=float)
+            policy_stack = table.ndim == 4
+
+        if not policy_stack:
+            table = table[np.newaxis]
+
+        if table.ndim != 4 or table.shape[1] < self.K_MAX_INDEX or table.shape[2] < self.EC_MAX or table.shape[3] != self.DAYS:
+            raise ValueError(self.__class__.__name__, ":evaluatePolicy Invalid policy table shape {}.".format(table.shape))
+
+        results = self._propagate(table)
+
+        return results if policy_stack else {key: value[0] for key, value in results.items()}
+
+    def _propagate(self, table: np.ndarray) -> dict:
+        '''Pushes the initial state distribution through the year for a (policies, 8, 12, 250) stack of tables.'''
+        policies = table.shape[0]
+        k_multipliers = self.K_MULTIPLIERS[:self.K_MAX_INDEX]
+
+        # (policies, days elapsed, ec_number, k_mul) actions and transition probabilities of the live states
+        actions = np.ascontiguousarray(table[:, :self.K_MAX_INDEX, :self.EC_MAX, :].transpose(0, 3, 2, 1))
+        reported = actions * self._normal_var
+        p_no_ec = ndtr(reported)
+        p_no_bc = ndtr(reported * k_multipliers * SQRT_10)
+        # BaselSimple draws a single uniform against the cumulated [no EC, EC without bankruptcy, bankruptcy] probabilities
+        p_ec = np.maximum(p_no_bc - p_no_ec, 0)
+        # on the backtesting day, BaselSimple only draws bankruptcies (its EC check reads the ttob, which is then 1)
+        p_end_bc = 1 - p_no_bc
+
+        mass = np.broadcast_to(self._initial_mass, (policies, ) + self._initial_mass.shape).copy()
+        group_ttobs = self._group_ttobs
+        group_index = np.arange(len(group_ttobs))
+
+        expected_reward = np.zeros(policies)
+        bankruptcy = np.zeros(policies)
+        final_ec = np.zeros((policies, self.EC_MAX))
+
+        for step in range(group_ttobs.max()):
+            ttobs = group_ttobs - step
+            live = ttobs >= 1
+            groups = group_index[live]
+            columns = self.DAYS - ttobs[live]
+
+            group_mass = mass[:, groups]
+            group_actions = actions[:, columns]
+            is_end = (ttobs[live] == 1)[np.newaxis, :, np.newaxis, np.newaxis]
+
+            stay = group_mass * np.where(is_end, p_no_bc[:, columns], p_no_ec[:, columns])
+            exceed = np.where(is_end, 0, group_mass * p_ec[:, columns])
+            bankrupt = group_mass * np.where(is_end, p_end_bc[:, columns], 1 - np.maximum(p_no_bc[:, columns], p_no_ec[:, columns]))
+
+            # an exceedance past the last allowed one is a bankruptcy
+            bankrupt_mass = bankrupt.sum(axis=(1, 2, 3)) + exceed[:, :, -1].sum(axis=(1, 2))
+
+            next_mass = stay.copy()
+            next_mass[:, :, 1:] += exceed[:, :, :-1]
+            # the actions' weight on the next states, as the reward is computed on the action and the next k_mul
+            next_action_mass = stay * group_actions
+            next_action_mass[:, :, 1:] += exceed[:, :, :-1] * group_actions[:, :, :-1]
+
+            bankruptcy += bankrupt_mass
+            expected_reward -= bankrupt_mass
+
+            scale = self.REWARD_SCALE * self._normal_var10
+            review = is_end[0, :, 0, 0]
+
+            if (~review).any():
+                expected_reward += scale * (next_action_mass[:, ~review] * k_multipliers).sum(axis=(1, 2, 3))
+
+            if review.any():
+                # the yearly review collapses k_mul onto the one matching the exceedances
+                ec_mass = next_mass[:, review].sum(axis=(1, 3))
+                ec_action_mass = next_action_mass[:, review].sum(axis=(1, 3))
+
+                expected_reward += scale * (ec_action_mass * k_multipliers[self._review_k]).sum(axis=1)
+                expected_reward -= (ec_mass * self.K_MULTIPLIERS_REWARD[self._review_k]).sum(axis=1)
+                final_ec += ec_mass
+
+                next_mass[:, review] = 0
+
+            mass[:, groups] = next_mass
+
+        multiplier_distribution = np.zeros((policies, self.K_MAX_INDEX + 1))
+        np.add.at(multiplier_distribution.T, self._review_k, final_ec.T)
+        multiplier_distribution[:, self.K_MAX_INDEX] = bankruptcy
+
+        return {
+            "expected_reward": expected_reward,
+            "bankruptcy_probability": bankruptcy,
+            "multiplier_distribution": multiplier_distribution,
+            "exceedance_distribution": np.concatenate((final_ec, bankruptcy[:, np.newaxis]), axis=1)}
@@ -1,7 +1,7 @@
 from collections import deque
 from collections import defaultdict
 from enum import auto, Enum, unique
-from typing import Deque, Dict
+from typing import Callable, Deque, Dict, Hashable, Tuple
 
 import numpy as np
 
@@ -12,9 +12,25 @@ class SimulationMonitorBase(object):
     @unique
     class RecordBaseCategory(Enum):
         OBSERVATIONS = auto(),
+        # Per year per path log likelihood ratio of the returns drawn up to the year's end (importance sampling)
+        LOG_LIKELIHOOD_RATIO = auto(),
 
     def __init__(self, config: dict):
         self._generic_records: Dict = defaultdict(deque)
+        # per-category modification counters, used to invalidate cached derived records and queries
+        self._record_versions: Dict = defaultdict(int)
+        # derived categories: category -> (compute function, dependencies)
+        self._derived_records: Dict = {}
+        self._derived_cache: Dict = {}
+        self._query_cache: Dict = {}
+        # categories whose last axis spans the simulated paths, and that axis' size
+        self._path_categories: set = set()
+        self._path_count: int = None
+        # overrides the configured path count, see configurePaths
+        self._path_override: int = None
+        # index of the first path held by the records, see configurePaths
+        self._path_offset: int = 0
+        self._config: dict = config
         self.preConfigure(config)
 
     def preConfigure(self, config={}) -> None:
@@ -64,9 +80,181 @@ class SimulationMonitorBase(object):
             record_book.fill(0)
  
         record_book[record_key] = record
+        self.markModified(category_key)
 
         return record_book[-1]
 
+    def allocateRecord(self, category_key, shape: tuple, dtype=float, fill_value=0, path_record: bool = False) -> np.array:
+        '''Allocates (or re-allocates) the record for the specified category.
+
+        Parameters
+        ----------
+        category_key : str
+            The record category.
+        shape : tuple
+            The record's shape.
+        dtype : optional
+            The record's dtype, by default float.
+        fill_value : optional
+            The record's initial value, by default 0.
+        path_record : bool, optional
+            Whether the record's last axis spans the simulated paths, by default False.
+
+        Returns
+        -------
+        np.array
+            The allocated record.
+        '''
+        self._generic_records[category_key] = np.full(shape, fill_value, dtype=dtype)
+        self.markModified(category_key)
+
+        if path_record:
+            self._path_categories.add(category_key)
+
+        return self._generic_records[category_key]
+
+    def _pathShape(self, shape: tuple) -> tuple:
+        '''Applies the path count override (if any) onto the last axis of a configured record shape.'''
+        shape = tuple(shape)
+
+        return shape if self._path_override is None else shape[:-1] + (self._path_override, )
+
+    def configurePaths(self, paths: int, path_offset: int = 0) -> None:
+        '''Re-allocates the records for the specified number of paths, e.g. for chunked simulations.
+
+        Parameters
+        ----------
+        paths : int
+            The number of simulated paths.
+        path_offset : int, optional
+            The index of the first simulated path within the whole simulation, by default 0.
+        '''
+        self._path_override = paths
+        self._path_offset = path_offset
+        self.preConfigure(self._config)
+        self.markModified(*self._generic_records.keys())
+
+    def pathRecords(self) -> Dict:
+        '''Returns the records whose last axis spans the simulated paths.'''
+        return {category_key: self._generic_records[category_key] for category_key in self._path_categories
+            if category_key in self._generic_records}
+
+    def isPathRecord(self, category_key) -> bool:
+        '''Whether the record's last axis spans the simulated paths. Derived records inherit it from their dependencies.'''
+        derived = self._derived_records.get(category_key)
+
+        if derived is None:
+            return category_key in self._path_categories and category_key in self._generic_records
+
+        return len(derived[1]) > 0 and all(self.isPathRecord(dependency) for dependency in derived[1])
+
+    def installRecords(self, records: Dict, path_offset: int = 0) -> None:
+        '''Replaces the path records, e.g. with the merged records of a chunked simulation.
+
+        Parameters
+        ----------
+        records : Dict
+            The records, keyed by category, all sharing the same number of paths.
+        path_offset : int, optional
+            The index of the records' first path within the whole simulation, by default 0.
+        '''
+        for category_key, record in records.items():
+            self._generic_records[category_key] = record
+            self._path_categories.add(category_key)
+            self._path_count = record.shape[-1]
+
+        self._path_override = None
+        self._path_offset = path_offset
+        self.markModified(*self.categories())
+
+    def restoreRecords(self, records: Dict) -> None:
+        '''Replaces records, e.g. with those of a simulation snapshot, keeping the categories' path axis flags.
+
+        Parameters
+        ----------
+        records : Dict
+            The records, keyed by category.
+        '''
+        self._generic_records.update(records)
+        self.markModified(*self._generic_records.keys())
+
+    def snapshotState(self) -> dict:
+        '''Returns the monitor's state besides its records, see MonteCarloSimulator.snapshot.'''
+        return {}
+
+    def restoreState(self, state: dict) -> None:
+        '''Restores the state returned by snapshotState.'''
+        pass
+
+    def pathBytes(self) -> int:
+        '''Estimates the memory footprint of a single path across the monitor's records.'''
+        return sum(record.nbytes // record.shape[-1] for record in self.pathRecords().values() if record.shape[-1] > 0)
+
+    @property
+    def path_count(self) -> int:
+        return self._path_count
+
+    def markModified(self, *category_keys) -> None:
+        '''Flags the specified categories as modified, invalidating the derived records and queries depending on them.
+
+        Note: Writes made through addRecord are tracked automatically. Writes made directly on the arrays
+        returned by record() must be flagged through this method.
+
+        Parameters
+        ----------
+        category_keys : str
+            The record categories that were modified.
+
+        '''
+        record_versions = self._record_versions
+
+        for category_key in category_keys:
+            record_versions[category_key] += 1
+
+    def registerDerivedRecord(self, category_key, compute: Callable[['SimulationMonitorBase'], np.array], dependencies: Tuple = ()) -> None:
+        '''Registers a lazily computed record category.
+
+        The record is computed on its first retrieval through record() and cached until any of its
+        dependencies is modified.
+
+        Parameters
+        ----------
+        category_key : str
+            The category under which the derived record falls.
+        compute : Callable[[SimulationMonitorBase], np.array]
+            Computes the record from the monitor instance.
+        dependencies : tuple, optional
+            The record categories the derived record is computed from.
+
+        '''
+        if(category_key is None):
+            raise ValueError("SimulationMonitorBase:registerDerivedRecord Invalid category_key.")
+
+        if(compute is None):
+            raise ValueError("SimulationMonitorBase:registerDerivedRecord Invalid compute function.")
+
+        # derived records replace any pre-allocated record for the same category
+        self._generic_records.pop(category_key, None)
+        self._derived_records[category_key] = (compute, tuple(dependencies))
+        self._derived_cache.pop(category_key, None)
+        self.markModified(category_key)
+
+    def categories(self) -> list:
+        '''Returns every record category held by the monitor, derived ones included.'''
+        return list(self._generic_records.keys()) + [key for key in self._derived_records if not key in self._generic_records]
+
+    def isDerivedRecord(self, category_key) -> bool:
+        return category_key in self._derived_records
+
+    def recordVersion(self, category_key) -> Hashable:
+        '''Returns a token that changes whenever the specified record, or any of its dependencies, is modified.'''
+        derived = self._derived_records.get(category_key)
+
+        if derived is None:
+            return self._record_versions[category_key]
+
+        return (self._record_versions[category_key], ) + tuple(self.recordVersion(dependency) for dependency in derived[1])
+
     def record(self, record_category: str = None) -> np.array:
         '''Returns a record based on the provided category, if one is provided.
 
@@ -83,8 +271,181 @@ class SimulationMonitorBase(object):
         np.array
             The observation array for the specified details. If no detail is provided, all the records are returned.
         '''
-        
-        return self._generic_records if record_category is None else self._generic_records[record_category]
+        if record_category is None:
+            return self._generic_records
+
+        if record_category in self._derived_records:
+            return self._derivedRecord(record_category)
+
+        return self._generic_records[record_category]
+
+    def _derivedRecord(self, category_key) -> np.array:
+        version = self.recordVersion(category_key)
+        cached = self._derived_cache.get(category_key)
+
+        if cached is None or cached[0] != version:
+            cached = (version, self._derived_records[category_key][0](self))
+            self._derived_cache[category_key] = cached
+
+        return cached[1]
+
+    def _cachedQuery(self, query_key: Tuple, category_key, compute: Callable[[np.array], np.array], dependencies: Tuple = ()) -> np.array:
+        version = (self.recordVersion(category_key), ) + tuple(self.recordVersion(dependency) for dependency in dependencies)
+        cached = self._query_cache.get(query_key)
+
+        if cached is None or cached[0] != version:
+            cached = (version, compute(self.record(category_key)))
+            self._query_cache[query_key] = cached
+
+        return cached[1]
+
+    def quantiles(self, category_key, q, axis: int = -1) -> np.array:
+        '''Computes the quantiles of a record, e.g. the per-year percentiles across simulated paths.
+
+        Results are memoized until the underlying record is modified. As with record(), the returned
+        array is not a copy.
+
+        Parameters
+        ----------
+        category_key : str
+            The record category.
+        q : float or sequence of floats
+            The quantiles to compute, in [0, 1].
+        axis : int, optional
+            The axis along which to compute the quantiles, by default the last one (paths).
+
+        Returns
+        -------
+        np.array
+            The quantiles, with the quantile axis first when q is a sequence.
+        '''
+        q_key = tuple(np.atleast_1d(q).tolist()) if np.ndim(q) else float(q)
+
+        return self._cachedQuery(("quantiles", category_key, q_key, axis), category_key,
+            lambda record: np.quantile(record, q, axis=axis))
+
+    def rate(self, category_key, threshold: float = 0, axis: int = -1) -> np.array:
+        '''Computes the fraction of entries above threshold, e.g. the per-year bankruptcy rate.
+
+        Results are memoized until the underlying record is modified.
+
+        Parameters
+        ----------
+        category_key : str
+            The record category.
+        threshold : float, optional
+            Entries strictly above the threshold are counted, by default 0.
+        axis : int, optional
+            The axis along which to compute the rate, by default the last one (paths).
+
+        Returns
+        -------
+        np.array
+            The rate along the specified axis.
+        '''
+        return self._cachedQuery(("rate", category_key, threshold, axis), category_key,
+            lambda record: (record > threshold).mean(axis=axis))
+
+    def mean_by_year(self, category_key) -> np.array:
+        '''Computes the per-year (row) mean of a record across simulated paths (the last axis).
+
+        Results are memoized until the underlying record is modified.
+
+        Parameters
+        ----------
+        category_key : str
+            The record category.
+
+        Returns
+        -------
+        np.array
+            The mean of each row, per policy for records with a policy axis.
+        '''
+        return self._cachedQuery(("mean_by_year", category_key), category_key,
+            lambda record: record.mean(axis=-1))
+
+    def _weighted(self, category_key, compute: Callable[[np.array, np.array], np.array]) -> np.array:
+        rc_log_weights = SimulationMonitorBase.RecordBaseCategory.LOG_LIKELIHOOD_RATIO
+        log_weights = self._generic_records.get(rc_log_weights, None)
+
+        def weighted(record: np.array):
+            # records extended with the following year (e.g. the reviewed multipliers) are truncated
+            if log_weights is None:
+                return compute(record, np.ones(record.shape[-1]))
+
+            years = min(record.shape[0], log_weights.shape[0])
+            weights = self.normalizedWeights(log_weights[:years])
+            year_weights = weights.reshape((years, ) + (1, ) * (record.ndim - 2) + weights.shape[1:])
+
+            return compute(record[:years], year_weights)
+
+        return weighted
+
+    @staticmethod
+    def normalizedWeights(log_weights: np.array) -> np.array:
+        '''Self-normalises per year (row) log likelihood ratios into weights averaging 1 over the paths.
+
+        The log-sum-exp is taken out of the exponential, so that the cumulated ratios of long simulations
+        neither overflow nor underflow.
+        '''
+        log_max = log_weights.max(axis=-1, keepdims=True)
+        weights = np.exp(log_weights - log_max)
+
+        return weights * (weights.shape[-1] / weights.sum(axis=-1, keepdims=True))
+
+    @staticmethod
+    def _weightedEstimate(samples: np.array) -> Tuple[np.array, np.array]:
+        paths = samples.shape[-1]
+        estimate = samples.mean(axis=-1)
+        stderr = samples.std(axis=-1, ddof=1) / np.sqrt(paths) if paths > 1 else np.zeros_like(estimate)
+
+        return estimate, stderr
+
+    def weighted_rate(self, category_key, threshold: float = 0) -> Tuple[np.array, np.array]:
+        '''Computes the likelihood ratio weighted per-year rate of entries above threshold, e.g. the
+        bankruptcy probability under importance sampling, along with its standard error.
+
+        The weights are the paths' cumulated likelihood ratios up to each year, as the year's records
+        depend on every return drawn so far, self-normalised per year (see normalizedWeights). Unit
+        weights are used when the monitor holds no LOG_LIKELIHOOD_RATIO record.
+
+        Parameters
+        ----------
+        category_key : str
+            The record category.
+        threshold : float, optional
+            Entries strictly above the threshold are counted, by default 0.
+
+        Returns
+        -------
+        Tuple[np.array, np.array]
+            The per-year estimates and their standard errors.
+        '''
+        return self._cachedQuery(("weighted_rate", category_key, threshold), category_key,
+            self._weighted(category_key, lambda record, weights: self._weightedEstimate((record > threshold) * weights)),
+            dependencies=(SimulationMonitorBase.RecordBaseCategory.LOG_LIKELIHOOD_RATIO, ))
+
+    def weighted_mean(self, category_key) -> Tuple[np.array, np.array]:
+        '''Computes the likelihood ratio weighted per-year mean of a record, e.g. the expected annual
+        return under importance sampling, along with its standard error.
+
+        The weights are the paths' cumulated likelihood ratios up to each year, as the year's records
+        depend on every return drawn so far, self-normalised per year (see normalizedWeights). Unit
+        weights are used when the monitor holds no LOG_LIKELIHOOD_RATIO record.
+
+        Parameters
+        ----------
+        category_key : str
+            The record category.
+
+        Returns
+        -------
+        Tuple[np.array, np.array]
+            The per-year estimates and their standard errors.
+        '''
+        return self._cachedQuery(("weighted_mean", category_key), category_key,
+            self._weighted(category_key, lambda record, weights: self._weightedEstimate(record * weights)),
+            dependencies=(SimulationMonitorBase.RecordBaseCategory.LOG_LIKELIHOOD_RATIO, ))
 
     def flush(self, category_key: str = None) -> None:
         '''Flushes the records container for the specified category key. If none is provided,
@@ -98,6 +459,11 @@ class SimulationMonitorBase(object):
         '''
         (self._generic_records if category_key is None else self._generic_records[category_key]).clear()
 
+        if category_key is None:
+            self.markModified(*self._record_versions.keys())
+        else:
+            self.markModified(category_key)
+
     
     def dump(self, out_name: str, category_key, delimiter:str = ',') -> None:
         """
@@ -120,7 +486,7 @@ class SimulationMonitorBase(object):
         if not category_key or category_key is None:
             np.savetxt(out_name, self._generic_records[SimulationMonitorBase.RecordBaseCategory.OBSERVATIONS], delimiter)
         else:
-            records = self._generic_records[category_key]
+            records = self.record(category_key)
 
             if not records is None:
                 np.savetxt(out_name, records, delimiter=delimiter)
@@ -3,6 +3,7 @@ from enum import auto, Enum, unique
 import numpy as np
 
 from simulator.monitor.monitor_base import SimulationMonitorBase
+from simulator.monitor.monitor_events import SimulationEventLog, SimulationEventType
 
 class BaselSimulationMonitor(SimulationMonitorBase):
 
@@ -34,6 +35,55 @@ class BaselSimulationMonitor(SimulationMonitorBase):
         PORTFOLIO_INVESTEMENT_DAILY = auto(),
         # Return map per year per simulationID
         PORTFOLIO_INVESTMENT_ANNUAL_AVG = auto(),
+
+    # Default dtype per record category
+    DEFAULT_DTYPES = {
+        BaselRecordCategory.ACTION: float,
+        BaselRecordCategory.DISCLOSURE: float,
+        BaselRecordCategory.EXCEEDENCES: int,
+        BaselRecordCategory.KMULTIPLIERS_VALUE: float,
+        BaselRecordCategory.KMULTIPLIERS_INDECES: int,
+        BaselRecordCategory.BANKRUPTCY: int,
+        BaselRecordCategory.DISCLOSURE_ANNUAL_MEAN: float,
+        BaselRecordCategory.MRC_DAILY: float,
+        BaselRecordCategory.MRC_ANNUAL: float,
+        BaselRecordCategory.PORTFOLIO_INVESTEMENT_DAILY: float,
+        BaselRecordCategory.PORTFOLIO_INVESTMENT_ANNUAL_AVG: float,
+    }
+
+    # Categories the simulation's state is made of, always recorded
+    STATE_CATEGORIES = (
+        BaselRecordCategory.DISCLOSURE,
+        BaselRecordCategory.EXCEEDENCES,
+        BaselRecordCategory.BANKRUPTCY,
+        BaselRecordCategory.KMULTIPLIERS_VALUE,
+        BaselRecordCategory.KMULTIPLIERS_INDECES,
+    )
+
+    # Categories logged onto the event log, their dense records being rebuilt from it when the log is on
+    EVENT_CATEGORIES = (
+        BaselRecordCategory.EXCEEDENCES,
+        BaselRecordCategory.BANKRUPTCY,
+        BaselRecordCategory.KMULTIPLIERS_INDECES,
+    )
+
+    # Categories computed from other categories' records
+    RECORD_DEPENDENCIES = {
+        BaselRecordCategory.MRC_ANNUAL: (BaselRecordCategory.MRC_DAILY, ),
+        BaselRecordCategory.PORTFOLIO_INVESTMENT_ANNUAL_AVG: (BaselRecordCategory.PORTFOLIO_INVESTEMENT_DAILY, ),
+        BaselRecordCategory.RETURN_ANNUAL: (BaselRecordCategory.PORTFOLIO_INVESTMENT_ANNUAL_AVG, ),
+        BaselRecordCategory.RETURN_EFFECTIVE_ANNUAL: (BaselRecordCategory.RETURN_ANNUAL, BaselRecordCategory.PORTFOLIO_INVESTMENT_ANNUAL_AVG),
+    }
+
+    # Compact dtypes, applied over the defaults when "compact" is set:
+    # exceedances cap at 11, bankruptcy is 0/1, k multiplier indices are 0-7
+    # and actions are stored as codes of an action_resolution grid
+    COMPACT_DTYPES = {
+        BaselRecordCategory.ACTION: np.uint16,
+        BaselRecordCategory.EXCEEDENCES: np.int8,
+        BaselRecordCategory.KMULTIPLIERS_INDECES: np.int8,
+        BaselRecordCategory.BANKRUPTCY: np.int8,
+    }
     
     def __init__(self, config: dict):
         super().__init__(config)
@@ -59,53 +109,364 @@ class BaselSimulationMonitor(SimulationMonitorBase):
         #TODO from the simulation profile
 
         if obs_config:
-            observation_dims = obs_config.get("record_shape", 0)
+            self._configureDtypes(obs_config)
+            dtype = self.recordDtype
+
+            observation_dims = self._pathShape(obs_config.get("record_shape", 0))
+            daily_disclosure_dims = self._pathShape(obs_config.get("daily_disclosure_record_shape", 0))
+            self._path_count = observation_dims[-1]
+
+            # evaluating a stack of policies adds a policy axis ahead of the paths' axis
+            self._policy_count: int = obs_config.get("policy_count", None)
+
+            if self._policy_count is not None:
+                observation_dims = observation_dims[:1] + (self._policy_count, ) + observation_dims[1:]
+                daily_disclosure_dims = daily_disclosure_dims[:1] + (self._policy_count, ) + daily_disclosure_dims[1:]
+
             # expand the dim's 0 dimension (simulations) to accomodate the additional revised multiplier
             obs_dims_extended = (observation_dims[0] +1, ) + observation_dims[1:]
-            daily_disclosure_dims = obs_config.get("daily_disclosure_record_shape", 0)
-
-            #### Yearly Records ####
-
-            # pre-allocate space for yearly records
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.EXCEEDENCES] = \
-                np.zeros(observation_dims, dtype=int)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE_ANNUAL_MEAN] = \
-                np.zeros(observation_dims, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.BANKRUPTCY] = \
-                np.zeros(obs_dims_extended, dtype=int)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.MRC_ANNUAL] = \
-                np.zeros(observation_dims, dtype=float)
-
-            # yearly statistics
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.RETURN_ANNUAL] = \
-                np.zeros(observation_dims, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.RETURN_EFFECTIVE_ANNUAL] = \
-                np.zeros(observation_dims, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.PORTFOLIO_INVESTMENT_ANNUAL_AVG] = \
-                np.zeros(observation_dims, dtype=float)
-
-            # extended to accomodate reviewed following year
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.KMULTIPLIERS_VALUE] = \
-                np.full(shape=obs_dims_extended, fill_value=3.0, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.KMULTIPLIERS_INDECES] = \
-                np.zeros(obs_dims_extended, dtype=int)
-            
-            #### Daily Records ####
-
-            # pre-allocate space for daily records for yearly averaging purposes
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE] = \
-                np.zeros(daily_disclosure_dims, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.PORTFOLIO_INVESTEMENT_DAILY] = \
-                np.zeros(daily_disclosure_dims, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.ACTION] = \
-                np.zeros(daily_disclosure_dims, dtype=float)
-            self._generic_records[BaselSimulationMonitor.BaselRecordCategory.MRC_DAILY] = \
-                np.zeros(daily_disclosure_dims, dtype=float)
-            
+
+            # allocate the recorded categories only, see _configureCategories
+            self._configureCategories(obs_config)
+            is_recorded = self.isRecorded
+
+            self._observation_dims: tuple = observation_dims
+            self._configureEventLog(obs_config)
+            # with the event log on, the state categories only hold the current and following years' rows, see stateRow
+            state_rows = self._state_rows = None if self._event_log is None else {}
+
+            for category, dims, fill_value in (
+                    #### Yearly Records ####
+                    (BaselSimulationMonitor.BaselRecordCategory.EXCEEDENCES, observation_dims, 0),
+                    (BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE_ANNUAL_MEAN, observation_dims, 0),
+                    (BaselSimulationMonitor.BaselRecordCategory.BANKRUPTCY, obs_dims_extended, 0),
+                    (BaselSimulationMonitor.BaselRecordCategory.MRC_ANNUAL, observation_dims, 0),
+                    # yearly statistics
+                    # RETURN_ANNUAL and RETURN_EFFECTIVE_ANNUAL are derived lazily, see registerDerivedRecord
+                    (BaselSimulationMonitor.BaselRecordCategory.PORTFOLIO_INVESTMENT_ANNUAL_AVG, observation_dims, 0),
+                    # extended to accomodate reviewed following year, the first year's multiplier being 3
+                    (BaselSimulationMonitor.BaselRecordCategory.KMULTIPLIERS_VALUE, obs_dims_extended, 3.0),
+                    (BaselSimulationMonitor.BaselRecordCategory.KMULTIPLIERS_INDECES, obs_dims_extended, 0),
+                    #### Daily Records ####
+                    # pre-allocate space for daily records for yearly averaging purposes
+                    (BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE, daily_disclosure_dims, 0),
+                    (BaselSimulationMonitor.BaselRecordCategory.PORTFOLIO_INVESTEMENT_DAILY, daily_disclosure_dims, 0),
+                    (BaselSimulationMonitor.BaselRecordCategory.ACTION, daily_disclosure_dims, 0),
+                    (BaselSimulationMonitor.BaselRecordCategory.MRC_DAILY, daily_disclosure_dims, 0)):
+                if state_rows is not None and (category in BaselSimulationMonitor.EVENT_CATEGORIES or
+                        category == BaselSimulationMonitor.BaselRecordCategory.KMULTIPLIERS_VALUE):
+                    state_rows[category] = np.full((2, ) + dims[1:], fill_value, dtype=dtype(category))
+                    self._generic_records.pop(category, None)
+                elif is_recorded(category):
+                    # zeroed records are committed lazily, as their pages are first written
+                    self._generic_records[category] = np.zeros(dims, dtype=dtype(category)) if fill_value == 0 else \
+                        np.full(dims, fill_value, dtype=dtype(category))
+                else:
+                    self._generic_records.pop(category, None)
+
+            self._path_categories.update(category for category in BaselSimulationMonitor.BaselRecordCategory
+                if category in self._generic_records)
+
+            if state_rows is not None:
+                for category in BaselSimulationMonitor.EVENT_CATEGORIES:
+                    self.registerDerivedRecord(category, lambda monitor, category=category: monitor.eventRecord(category))
         else:
             raise ValueError(self.__class__.__name__, ":__init__ Missing configuration for ", "basel_records")
     
+    def _configureDtypes(self, obs_config: dict) -> None:
+        '''Builds the dtype schema from the defaults, the compact preset and the "dtypes" overrides,
+        which may be keyed by BaselRecordCategory members or names.'''
+        self._record_dtypes = dict(BaselSimulationMonitor.DEFAULT_DTYPES)
+
+        if obs_config.get("compact", False):
+            self._record_dtypes.update(BaselSimulationMonitor.COMPACT_DTYPES)
+
+        for category, dtype in obs_config.get("dtypes", {}).items():
+            if not isinstance(category, BaselSimulationMonitor.BaselRecordCategory):
+                category = BaselSimulationMonitor.BaselRecordCategory[category]
+
+            self._record_dtypes[category] = dtype
+
+        self._record_dtypes = {category: np.dtype(dtype) for category, dtype in self._record_dtypes.items()}
+        self._action_resolution: float = obs_config.get("action_resolution", 0.001)
+
+        if self.hasActionCodes() and not self._action_resolution > 0:
+            raise ValueError(self.__class__.__name__, ":preConfigure Invalid action_resolution {}.".format(self._action_resolution))
+
+    def _configureCategories(self, obs_config: dict) -> None:
+        '''Resolves the recorded categories from "categories", which may list BaselRecordCategory members
+        or names, along with their dependencies and the state categories. Every category is recorded by default.'''
+        categories = obs_config.get("categories", None)
+
+        if categories is None:
+            self._recorded_categories = frozenset(BaselSimulationMonitor.BaselRecordCategory)
+            return
+
+        pending = list(BaselSimulationMonitor.STATE_CATEGORIES)
+
+        for category in categories:
+            if not isinstance(category, BaselSimulationMonitor.BaselRecordCategory):
+                if not category in BaselSimulationMonitor.BaselRecordCategory.__members__:
+                    raise ValueError(self.__class__.__name__, ":preConfigure Unknown record category {}.".format(category))
+
+                category = BaselSimulationMonitor.BaselRecordCategory[category]
+
+            pending.append(category)
+
+        recorded = set()
+
+        while pending:
+            category = pending.pop()
+
+            if not category in recorded:
+                recorded.add(category)
+                pending.extend(BaselSimulationMonitor.RECORD_DEPENDENCIES.get(category, ()))
+
+        self._recorded_categories = frozenset(recorded)
+
+    def isRecorded(self, category_key) -> bool:
+        '''Whether the specified category is recorded, i.e. allocated and computed by the profile.'''
+        return category_key in self._recorded_categories
+
+    def _configureEventLog(self, obs_config: dict) -> None:
+        '''Sets up the sparse event log when "event_log" is set. Chunks past the first keep appending
+        onto the log started by the first chunk.'''
+        self._event_state: dict = None
+
+        if not obs_config.get("event_log", False):
+            self._event_log: SimulationEventLog = None
+        elif getattr(self, "_event_log", None) is None or self._path_offset == 0:
+            self._event_log = SimulationEventLog(obs_config.get("event_log_capacity", 1024))
+
+    def stateRow(self, category_key, year: int) -> np.array:
+        '''Returns the year's row of a state category (EXCEEDENCES, BANKRUPTCY or the k multipliers).
+
+        With the event log on, only the current and following years' rows are held, alternating over the
+        years, the dense records being rebuilt from the log on demand, see eventRecord.
+        '''
+        if self._state_rows is None:
+            return self._generic_records[category_key][year]
+
+        return self._state_rows[category_key][year % 2]
+
+    def recordEvents(self, sim_num: int, day: int, done: bool) -> None:
+        '''Appends the day's state changes onto the event log, if any.
+
+        Exceedance count changes are detected against the previous call's state. Bankruptcies raise the
+        exceedance count to 11, so they are only looked for on the paths whose count changed, or already
+        was 11. k multiplier changes are detected against the current year's multipliers once the year
+        is reviewed (done).
+
+        Parameters
+        ----------
+        sim_num : int
+            The simulation year.
+        day : int
+            The simulated day.
+        done : bool
+            Whether the year's records, including the following year's multipliers, were reviewed.
+        '''
+        event_log = self._event_log
+
+        if event_log is None:
+            return
+
+        basel_record_categories = BaselSimulationMonitor.BaselRecordCategory
+        current_ecs: np.array = self.stateRow(basel_record_categories.EXCEEDENCES, sim_num)
+        bankruptcy: np.array = self.stateRow(basel_record_categories.BANKRUPTCY, sim_num)
+        state = self._event_state
+
+        if state is None:
+            state = self._event_state = {
+                "year": None,
+                "ecs": np.zeros_like(current_ecs),
+                "bankruptcy": np.zeros_like(bankruptcy),
+                "saturated": np.empty(0, dtype=np.intp),
+                "mask": np.empty(current_ecs.shape, dtype=bool)}
+
+        if state["year"] != sim_num:
+            # every year's exceedance row starts from 0, bankruptcy carries over from the previous year
+            state["ecs"].fill(0)
+            state["saturated"] = np.empty(0, dtype=np.intp)
+            if sim_num == 0:
+                state["bankruptcy"].fill(0)
+            state["year"] = sim_num
+
+        mask: np.array = state["mask"]
+        flat_ecs: np.array = current_ecs.reshape(-1)
+        flat_bankruptcy: np.array = bankruptcy.reshape(-1)
+
+        np.not_equal(current_ecs, state["ecs"], out=mask)
+        changed: np.array = np.flatnonzero(mask)
+
+        if len(changed) > 0:
+            self._appendEvents(SimulationEventType.EXCEEDANCE, sim_num, day, changed, flat_ecs[changed], mask.shape)
+            state["ecs"].reshape(-1)[changed] = flat_ecs[changed]
+
+            # paths reaching 11 exceedances while solvent would not change count on going bankrupt
+            saturated = changed[(flat_ecs[changed] == 11) & (flat_bankruptcy[changed] == 0)]
+
+            if len(saturated) > 0:
+                state["saturated"] = np.union1d(state["saturated"], saturated)
+
+        candidates: np.array = np.union1d(changed, state["saturated"]) if len(state["saturated"]) > 0 else changed
+        went_bankrupt = candidates[flat_bankruptcy[candidates] > state["bankruptcy"].reshape(-1)[candidates]]
+
+        if len(went_bankrupt) > 0:
+            self._appendEvents(SimulationEventType.BANKRUPTCY, sim_num, day, went_bankrupt, flat_bankruptcy[went_bankrupt], mask.shape)
+            state["bankruptcy"].reshape(-1)[went_bankrupt] = flat_bankruptcy[went_bankrupt]
+
+        if done:
+            rc_kmul_idx = basel_record_categories.KMULTIPLIERS_INDECES
+            reviewed_k_idx: np.array = self.stateRow(rc_kmul_idx, sim_num + 1)
+
+            np.not_equal(reviewed_k_idx, self.stateRow(rc_kmul_idx, sim_num), out=mask)
+            changed = np.flatnonzero(mask)
+
+            if len(changed) > 0:
+                self._appendEvents(SimulationEventType.KMULTIPLIER, sim_num, day, changed, reviewed_k_idx.reshape(-1)[changed], mask.shape)
+
+            # the following year's exceedance row still holds the counts of the year before, as rows alternate
+            if self._state_rows is not None:
+                self.stateRow(basel_record_categories.EXCEEDENCES, sim_num + 1).fill(0)
+
+    def _appendEvents(self, event: SimulationEventType, sim_num: int, day: int, changed: np.array, values: np.array, row_shape: tuple) -> None:
+        '''Appends events for the changed flat (policy x path) row indices.'''
+        policies = None
+
+        if self._policy_count is not None:
+            policies, changed = np.divmod(changed, row_shape[-1])
+
+        self._event_log.append(event, sim_num, day, changed + self._path_offset, values, policies)
+
+    def isPathRecord(self, category_key) -> bool:
+        # the records rebuilt from the event log span the simulated paths
+        if self._event_log is not None and category_key in BaselSimulationMonitor.EVENT_CATEGORIES:
+            return True
+
+        return super().isPathRecord(category_key)
+
+    def snapshotState(self) -> dict:
+        state = super().snapshotState()
+
+        if self._event_log is not None:
+            state["event_log"] = self._event_log.copy()
+            state["state_rows"] = {category: np.copy(rows) for category, rows in self._state_rows.items()}
+            state["event_state"] = None if self._event_state is None else \
+                {key: np.copy(value) if isinstance(value, np.ndarray) else value for key, value in self._event_state.items()}
+
+        return state
+
+    def restoreState(self, state: dict) -> None:
+        super().restoreState(state)
+
+        if self._event_log is not None and "event_log" in state:
+            self._event_log = state["event_log"].copy()
+            self._state_rows = {category: np.copy(rows) for category, rows in state["state_rows"].items()}
+            self.markModified(*BaselSimulationMonitor.EVENT_CATEGORIES)
+            self._event_state = None if state["event_state"] is None else \
+                {key: np.copy(value) if isinstance(value, np.ndarray) else value for key, value in state["event_state"].items()}
+
+    def eventRecord(self, category_key) -> np.array:
+        '''Rebuilds the dense EXCEEDENCES, BANKRUPTCY or KMULTIPLIERS_INDECES record from the event log.
+
+        The rebuilt records match the dense ones the monitor holds without the event log, at the end of
+        every year. They span the monitor's paths, from its path offset on.
+        '''
+        basel_record_categories = BaselSimulationMonitor.BaselRecordCategory
+
+        if self._event_log is None:
+            raise ValueError(self.__class__.__name__, ":eventRecord The event log is not enabled.")
+
+        years = self._observation_dims[0]
+        row_shape = self._observation_dims[1:-1] + (self._path_count, )
+        dtype = self.recordDtype(category_key) if category_key in self._record_dtypes else int
+        path_offset = self._path_offset
+
+        if category_key == basel_record_categories.EXCEEDENCES:
+            return self._event_log.dense(SimulationEventType.EXCEEDANCE, years, row_shape, dtype=dtype, path_offset=path_offset)
+
+        if category_key == basel_record_categories.BANKRUPTCY:
+            return self._event_log.dense(SimulationEventType.BANKRUPTCY, years + 1, row_shape, carry=True, dtype=dtype,
+                path_offset=path_offset)
+
+        if category_key == basel_record_categories.KMULTIPLIERS_INDECES:
+            # the multipliers reviewed on a year apply on the following one
+            k_idx = np.zeros((years + 1, ) + row_shape, dtype=dtype)
+            k_idx[1:] = self._event_log.dense(SimulationEventType.KMULTIPLIER, years, row_shape, carry=True, dtype=dtype,
+                path_offset=path_offset)
+            return k_idx
+
+        raise ValueError(self.__class__.__name__, ":eventRecord Unsupported category {}.".format(category_key))
+
+    def bankruptcyTime(self, path: int, policy: int = None) -> tuple:
+        '''Returns the (year, day) on which the path went bankrupt, None if it never did.'''
+        if self._event_log is None:
+            raise ValueError(self.__class__.__name__, ":bankruptcyTime The event log is not enabled.")
+
+        return self._event_log.first(SimulationEventType.BANKRUPTCY, path, policy)
+
+    def recordDtype(self, category_key) -> np.dtype:
+        '''Returns the dtype configured for the specified record category.'''
+        return self._record_dtypes[category_key]
+
+    def hasActionCodes(self) -> bool:
+        '''Whether actions are stored as integer codes of the action_resolution grid.'''
+        return self._record_dtypes[BaselSimulationMonitor.BaselRecordCategory.ACTION].kind in "iu"
+
+    def encodeActions(self, actions: np.array, out: np.array = None, scratch: np.array = None) -> np.array:
+        '''Converts disclosed actions into the ACTION record's representation.
+
+        Parameters
+        ----------
+        actions : np.array
+            The disclosed actions.
+        out : np.array, optional
+            The array receiving the encoded actions, e.g. a row of the ACTION record.
+        scratch : np.array, optional
+            Float scratch space shaped as actions, avoiding temporaries when encoding into out.
+
+        Returns
+        -------
+        np.array
+            The actions' codes, rounded to the nearest action_resolution multiple, when the ACTION
+            record has an integer dtype. The actions themselves otherwise.
+        '''
+        if not self.hasActionCodes():
+            if out is None:
+                return actions
+
+            np.copyto(out, actions)
+            return out
+
+        codes = np.divide(actions, self._action_resolution, out=scratch)
+        np.rint(codes, out=codes)
+
+        dtype = self.recordDtype(BaselSimulationMonitor.BaselRecordCategory.ACTION)
+        code_range = np.iinfo(dtype)
+
+        # casting would silently wrap codes beyond the integer dtype's range
+        if codes.size > 0 and (codes.min() < code_range.min or codes.max() > code_range.max):
+            raise ValueError(self.__class__.__name__, ":encodeActions Actions in [{}, {}] exceed the {} action codes at resolution {}.".format(
+                codes.min() * self._action_resolution, codes.max() * self._action_resolution, dtype.name, self._action_resolution))
+
+        if out is None:
+            return codes.astype(dtype)
+
+        np.copyto(out, codes, casting='unsafe')
+        return out
+
+    def decodeActions(self, codes: np.array = None) -> np.array:
+        '''Converts ACTION records, by default the whole ACTION record, back into disclosed actions.'''
+        if codes is None:
+            codes = self.record(BaselSimulationMonitor.BaselRecordCategory.ACTION)
+
+        return codes * self._action_resolution if self.hasActionCodes() else codes
+
     def addRecord(self, category_key: str, record: np.array, record_key: int, flush: bool = False) -> None:
+        if(category_key == BaselSimulationMonitor.BaselRecordCategory.ACTION):
+            record = self.encodeActions(record)
+
         if(category_key == BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE):
 
             disclosure_history = self.disclosure_history
@@ -114,11 +475,27 @@ class BaselSimulationMonitor(SimulationMonitorBase):
                     disclosure_history.clear()
 
                 self.disclosure_history[record_key] = record
+                self.markModified(category_key)
 
             return
         
         super().addRecord(category_key, record, record_key, flush)
 
+    @property
+    def recorded_categories(self) -> frozenset:
+        '''The recorded categories, dependencies and state categories included.'''
+        return self._recorded_categories
+
+    @property
+    def event_log(self) -> SimulationEventLog:
+        '''The sparse event log, None unless "event_log" is set.'''
+        return self._event_log
+
+    @property
+    def policy_count(self) -> int:
+        '''The size of the records' policy axis, None if the records hold a single policy.'''
+        return self._policy_count
+
     @property
     def disclosure_history(self) -> np.array:
         return self._generic_records[BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE]
\ No newline at end of file
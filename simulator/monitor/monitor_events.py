@@ -0,0 +1,164 @@
+from enum import IntEnum, unique
+from typing import Tuple
+
+import numpy as np
+
+@unique
+class SimulationEventType(IntEnum):
+    # The path's exceedance count changed, value holds the new count
+    EXCEEDANCE = 1
+    # The path went bankrupt
+    BANKRUPTCY = 2
+    # The path's k multiplier index changed at the yearly review, value holds the new index
+    KMULTIPLIER = 3
+
+class SimulationEventLog(object):
+    '''Sparse, append-only log of per-path state changes.
+
+    Events are stored column-wise in compact arrays whose capacity doubles as needed, so recording
+    costs are proportional to the number of state changes rather than to the number of paths.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        The initial number of events the log can hold, by default 1024.
+    '''
+
+    DTYPE = np.dtype([
+        ("path", np.int32),
+        ("policy", np.int16),
+        ("year", np.int32),
+        ("day", np.int16),
+        ("event", np.int8),
+        ("value", np.int16)])
+
+    def __init__(self, capacity: int = 1024):
+        self._events: np.ndarray = np.zeros(max(capacity, 1), dtype=SimulationEventLog.DTYPE)
+        self._size: int = 0
+
+    def append(self, event: SimulationEventType, year: int, day: int, paths: np.ndarray, values: np.ndarray,
+            policies: np.ndarray = None) -> None:
+        '''Appends one event per path.
+
+        Parameters
+        ----------
+        event : SimulationEventType
+            The events' type.
+        year : int
+            The simulation year (sim_num) the events occured on.
+        day : int
+            The day the events occured on.
+        paths : np.ndarray
+            The paths' indices.
+        values : np.ndarray
+            The paths' new state values.
+        policies : np.ndarray, optional
+            The paths' policy indices, when simulating a stack of policies.
+        '''
+        count = len(paths)
+
+        if count == 0:
+            return
+
+        if self._size + count > len(self._events):
+            grown = np.zeros(max(2 * len(self._events), self._size + count), dtype=SimulationEventLog.DTYPE)
+            grown[:self._size] = self._events[:self._size]
+            self._events = grown
+
+        appended = self._events[self._size:self._size + count]
+        appended["path"] = paths
+        appended["policy"] = 0 if policies is None else policies
+        appended["year"] = year
+        appended["day"] = day
+        appended["event"] = event
+        appended["value"] = values
+
+        self._size += count
+
+    def events(self, event: SimulationEventType = None, path: int = None, policy: int = None) -> np.ndarray:
+        '''Returns the logged events, in recording order, optionally filtered.
+
+        Note: Unfiltered, the method returns a view of the log rather than a copy.
+        '''
+        events = self._events[:self._size]
+        mask = None
+
+        for column, value in (("event", event), ("path", path), ("policy", policy)):
+            if value is not None:
+                column_mask = events[column] == value
+                mask = column_mask if mask is None else mask & column_mask
+
+        return events if mask is None else events[mask]
+
+    def first(self, event: SimulationEventType, path: int, policy: int = None) -> Tuple[int, int]:
+        '''Returns the (year, day) of the path's first event of the specified type, None if there is none.
+
+        e.g. first(SimulationEventType.BANKRUPTCY, path) answers when the path went bankrupt.
+        '''
+        events = self.events(event, path, policy)
+
+        return None if len(events) == 0 else (int(events["year"][0]), int(events["day"][0]))
+
+    def dense(self, event: SimulationEventType, years: int, row_shape: tuple, carry: bool = False, dtype=int,
+            path_offset: int = 0) -> np.ndarray:
+        '''Rebuilds a dense (years, *row_shape) view holding each year's last logged value per path.
+
+        Parameters
+        ----------
+        event : SimulationEventType
+            The events' type.
+        years : int
+            The number of rows of the view.
+        row_shape : tuple
+            The shape of a year's row, (paths, ) or (policies, paths).
+        carry : bool, optional
+            Whether values carry over onto the following years, by default False (reset to 0 every year).
+        dtype : optional
+            The view's dtype, by default int.
+        path_offset : int, optional
+            The index of the view's first path, by default 0. Events of paths out of the view are left out.
+        '''
+        events = self.events(event)
+        paths = events["path"] - path_offset
+        events = events[(paths >= 0) & (paths < row_shape[-1])]
+        dense = np.zeros((years, ) + tuple(row_shape), dtype=dtype)
+
+        if len(events) == 0:
+            return dense
+
+        paths = events["path"] - path_offset
+        row_index = paths if len(row_shape) == 1 else np.ravel_multi_index((events["policy"], paths), row_shape)
+        keys = events["year"].astype(np.int64) * int(np.prod(row_shape)) + row_index
+
+        # keep the last event per (year, path)
+        _, last_reversed = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last_reversed
+
+        flat = dense.reshape(years, -1)
+        flat[events["year"][last], row_index[last]] = events["value"][last]
+
+        if carry:
+            changed = np.zeros(flat.shape, dtype=bool)
+            changed[events["year"][last], row_index[last]] = True
+
+            for year in range(1, years):
+                np.copyto(flat[year], flat[year - 1], where=~changed[year])
+
+        return dense
+
+    def copy(self) -> 'SimulationEventLog':
+        event_log = SimulationEventLog(len(self._events))
+        event_log._events[:self._size] = self._events[:self._size]
+        event_log._size = self._size
+
+        return event_log
+
+    def clear(self) -> None:
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._size * SimulationEventLog.DTYPE.itemsize
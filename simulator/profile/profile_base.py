@@ -30,6 +30,18 @@ class SimulationProfileBase(object):
     def performTransition(self, daily_return: np.ndarray, observation: np.ndarray) -> None:
         raise NotImplementedError
 
+    def pathBytes(self) -> int:
+        '''Estimates the memory footprint of a single path, for the monitor's records and the transition's temporaries.'''
+        return self._monitor.pathBytes()
+
+    def snapshotState(self) -> dict:
+        '''Returns the profile's state, its monitor's included, besides the monitor's records, see MonteCarloSimulator.snapshot.'''
+        return {"monitor": self._monitor.snapshotState()}
+
+    def restoreState(self, state: dict) -> None:
+        '''Restores the state returned by snapshotState.'''
+        self._monitor.restoreState(state["monitor"])
+
     @property
     def distribution(self):
         return self._dist
@@ -1,3 +1,5 @@
+import logging
+
 import numpy as np
 
 from math import sqrt
@@ -8,6 +10,8 @@ from typing import Deque, Type
 from scipy.stats.distributions import norm
 
 from simulator.profile.profile_base import SimulationProfileBase
+from simulator.profile.profile_basel_kernel import basel_day_kernel, NUMBA_AVAILABLE
+from simulator.distribution.distribution_discrete import DiscreteSimulationDistribution
 from simulator.distribution.distribution_base import SimulationDistributionBase
 from simulator.monitor.monitor_base import SimulationMonitorBase
 from simulator.monitor.monitor_basel import BaselSimulationMonitor
@@ -41,15 +45,88 @@ class BaselSimulationProfile(SimulationProfileBase):
             [0, 0, 0, 0, 0, 1, 2, 3, 4, 5, 6, 7]])
 
         self._fixed_daily_return: int = 6/100/250
+        self._asset_price: float = 1
+        # the number of daily investment records accounted for in the annual statistics
+        self._annual_investment_days: int = 0
+
+        # workspace mode pre-allocates per-path buffers once and runs the day step in place
+        self._use_workspace: bool = config.get("use_workspace", False)
+        self._workspace: dict = None
+        # policy index column, broadcast over the paths when evaluating a stack of policies
+        self._policy_indices: np.ndarray = None
+
+        # the fused (Numba) day kernel, falling back on the workspace mode when unavailable
+        self._use_kernel: bool = config.get("use_kernel", False)
+
+        if self._use_kernel and not NUMBA_AVAILABLE:
+            logging.warning("BaselSimulationProfile:__init__ Numba is not available, falling back on the workspace mode.")
+            self._use_kernel = False
+            self._use_workspace = True
+
+        self._registerDerivedRecords()
+
+    def pathBytes(self) -> int:
+        # roughly a dozen float64 temporaries (or workspace buffers) per path and policy
+        return super().pathBytes() + 12 * 8 * (getattr(self._dist, "policyCount", None) or 1)
+
+    def snapshotState(self) -> dict:
+        return dict(super().snapshotState(), annual_investment_days=self._annual_investment_days)
+
+    def restoreState(self, state: dict) -> None:
+        super().restoreState(state)
+        self._annual_investment_days = state["annual_investment_days"]
+
+    def _registerDerivedRecords(self) -> None:
+        '''Registers the yearly return statistics as lazily computed records on the monitor,
+        as both are derivable from the annual average investment.'''
+        monitor: BaselSimulationMonitor = self._monitor
+
+        if monitor is None:
+            return
+
+        basel_record_categories = BaselSimulationMonitor.BaselRecordCategory
+        rc_investment_avg = basel_record_categories.PORTFOLIO_INVESTMENT_ANNUAL_AVG
+        rc_return = basel_record_categories.RETURN_ANNUAL
+        rc_kmul_idx = basel_record_categories.KMULTIPLIERS_INDECES
+        rc_kmul_value = basel_record_categories.KMULTIPLIERS_VALUE
+
+        if monitor.event_log is not None:
+            # the event log only holds the multipliers' indices, their values following from the k multiplier table
+            k_values = np.zeros(int(self._k_multipliers[1].max()) + 1)
+            k_values[self._k_multipliers[1].astype(int)] = self._k_multipliers[0]
+
+            monitor.registerDerivedRecord(rc_kmul_value,
+                lambda m: k_values[m.record(rc_kmul_idx)].astype(m.recordDtype(rc_kmul_value)), dependencies=(rc_kmul_idx, ))
+
+        if not monitor.isRecorded(rc_return):
+            return
+
+        monitor.registerDerivedRecord(rc_return,
+            lambda m: m.record(rc_investment_avg) * (self._annual_investment_days * self._asset_price * self._fixed_daily_return),
+            dependencies=(rc_investment_avg, ))
+
+        def effective_return(m: BaselSimulationMonitor) -> np.array:
+            investment_avg: np.array = m.record(rc_investment_avg)
+            return np.divide(m.record(rc_return), investment_avg, out=np.zeros_like(investment_avg), where=investment_avg != 0)
+
+        if monitor.isRecorded(basel_record_categories.RETURN_EFFECTIVE_ANNUAL):
+            monitor.registerDerivedRecord(basel_record_categories.RETURN_EFFECTIVE_ANNUAL, effective_return,
+                dependencies=(rc_return, rc_investment_avg))
 
     def performTransition(self, daily_return: np.ndarray, sim_state: np.ndarray) -> None:
+        if self._use_kernel and isinstance(self._dist, DiscreteSimulationDistribution):
+            return self._performTransitionKernel(daily_return, sim_state)
+
+        if self._use_workspace or self._use_kernel:
+            return self._performTransitionInPlace(daily_return, sim_state)
+
         monitor: BaselSimulationMonitor = self._monitor
         sim_num: int = sim_state[0]
         day: int = sim_state[1]
         done: bool = sim_state[2]
         basel_record_categories: Type[Enum] = BaselSimulationMonitor.BaselRecordCategory
         
-        asset_price: float = 1
+        asset_price: float = self._asset_price
 
         # pointers to cleanup the code
         rc_kmul_idx = basel_record_categories.KMULTIPLIERS_INDECES
@@ -58,23 +135,27 @@ class BaselSimulationProfile(SimulationProfileBase):
         rc_bk = basel_record_categories.BANKRUPTCY
 
         # helper to clean the code
-        fetch_record = lambda key, id = None: monitor.record(key) if id is None else  monitor.record(key)[id]
+        fetch_record = lambda key, id = None: monitor.record(key) if id is None else  monitor.stateRow(key, id)
 
         current_k_idx: np.array = fetch_record(rc_kmul_idx, sim_num)
         current_k: np.array = fetch_record(rc_kmul_value, sim_num)
         current_ecs: np.array = fetch_record(rc_ec, sim_num)
 
         # fetch the previous' period's bankruptcy state, as its a permanent state
-        bankruptcy: np.array = monitor.record(rc_bk)[sim_num]
+        bankruptcy: np.array = monitor.stateRow(rc_bk, sim_num)
                 
         disclosure_history: np.array = monitor.disclosure_history
 
         # turn observations into rows to be fed onto getAction (Discrete Simulation)
         # Subtract day as the estimated distribution 250 equals 0
-        env_obs: np.ndarray = np.vstack((current_k_idx.T, current_ecs.T, np.full(current_ecs.T.shape, 249 - day))).astype(np.int32)
+        if current_ecs.ndim == 1:
+            env_obs: np.ndarray = np.vstack((current_k_idx.T, current_ecs.T, np.full(current_ecs.T.shape, 249 - day))).astype(np.int32)
+        else:
+            env_obs: np.ndarray = np.vstack([component.ravel() for component in
+                np.broadcast_arrays(*self._observationComponents(current_k_idx, current_ecs, day))]).astype(np.int32)
    
         #disclosure = normvar * disclosed value
-        disclosure: np.array = self.distribution.getAction(env_obs)
+        disclosure: np.array = self.distribution.getAction(env_obs).reshape(current_ecs.shape)
 
         #bankrupt states should always report the maximum value so as to avoid bankruptcy
         disclosure[current_ecs == 10] = self._max_report_value
@@ -87,7 +168,7 @@ class BaselSimulationProfile(SimulationProfileBase):
         # given that time goes backwards (250->0)
         reported_mean = disclosure_history[-1:(day-251):-1, :].mean(axis=0)
 
-        mrc_period: np.array = reported_mean.T * current_k * SQRT_10
+        mrc_period: np.array = reported_mean * current_k * SQRT_10
 
         #BC = MRC is below the loss, MRC = mean(last_60_disclosure) * kMul * sqrt(10)
         bankruptcy += (mrc_period < daily_return)
@@ -102,42 +183,257 @@ class BaselSimulationProfile(SimulationProfileBase):
         current_ecs += (bankruptcy) * 11
         current_ecs = np.minimum(current_ecs.astype(int), 11)
 
-        monitor.record(rc_ec)[sim_num] = current_ecs
-        monitor.record(rc_bk)[sim_num] = bankruptcy
+        monitor.stateRow(rc_ec, sim_num)[...] = current_ecs
+        monitor.stateRow(rc_bk, sim_num)[...] = bankruptcy
 
-        monitor.record(basel_record_categories.MRC_DAILY)[day] = mrc_period
+        # categories left out of the monitor's "categories" are neither computed nor stored
+        if monitor.isRecorded(basel_record_categories.MRC_DAILY):
+            monitor.record(basel_record_categories.MRC_DAILY)[day] = mrc_period
         # the invested amount corresponds to the portfolio + mrc in proportion
-        monitor.record(basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY)[day] = 100000 / mrc_period * asset_price
+        if monitor.isRecorded(basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY):
+            monitor.record(basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY)[day] = 100000 / mrc_period * asset_price
+        monitor.markModified(rc_ec, rc_bk, basel_record_categories.MRC_DAILY, basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY)
 
-        monitor.addRecord(category_key=basel_record_categories.ACTION, record=disclosure, record_key=day)
+        if monitor.isRecorded(basel_record_categories.ACTION):
+            monitor.addRecord(category_key=basel_record_categories.ACTION, record=disclosure, record_key=day)
 
         if(done):
-            #review the k Multiplier applicable on the following year
-            reviewed_k_idx = (self._k_multipliers[1, current_ecs]).astype(int)
-            reviewed_k_val: np.array = self._k_multipliers[0, current_ecs]
+            self._reviewYear(sim_num, day, current_ecs, bankruptcy, reported_mean)
 
-            monitor.record(rc_kmul_idx)[sim_num+1] = reviewed_k_idx
-            monitor.record(rc_kmul_value)[sim_num+1] = reviewed_k_val
-            monitor.record(rc_bk)[sim_num+1] = bankruptcy
+        monitor.recordEvents(sim_num, day, done)
 
-            # store the year's average disclosure
-            monitor.record(basel_record_categories.DISCLOSURE_ANNUAL_MEAN)[sim_num] = reported_mean
+    def _performTransitionInPlace(self, daily_return: np.ndarray, sim_state: np.ndarray) -> None:
+        '''Workspace counterpart of performTransition.
 
-            # store the year's average mrc
-            monitor.record(basel_record_categories.MRC_ANNUAL)[sim_num] = monitor.record(basel_record_categories.MRC_DAILY).mean(axis=0)
-            
-            # review the investment amount considering a fixed daily return equal to 6%
-            daily_investment: np.array = monitor.record(basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY)
-            annual_investment_avg: np.array =  daily_investment[:day+1,:].mean(axis=0)
-            monitor.addRecord(basel_record_categories.PORTFOLIO_INVESTMENT_ANNUAL_AVG, annual_investment_avg, sim_num)
+        Produces the same records, writing straight into the monitor's rows and the profile's
+        pre-allocated per-path buffers instead of allocating temporaries every day.
+        '''
+        monitor: BaselSimulationMonitor = self._monitor
+        sim_num: int = sim_state[0]
+        day: int = sim_state[1]
+        done: bool = sim_state[2]
+        basel_record_categories: Type[Enum] = BaselSimulationMonitor.BaselRecordCategory
+
+        rc_ec = basel_record_categories.EXCEEDENCES
+        rc_bk = basel_record_categories.BANKRUPTCY
+        rc_disclosure = basel_record_categories.DISCLOSURE
+        rc_action = basel_record_categories.ACTION
+        rc_mrc_daily = basel_record_categories.MRC_DAILY
+        rc_investment_daily = basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY
+
+        current_k_idx: np.array = monitor.stateRow(basel_record_categories.KMULTIPLIERS_INDECES, sim_num)
+        current_k: np.array = monitor.stateRow(basel_record_categories.KMULTIPLIERS_VALUE, sim_num)
+        current_ecs: np.array = monitor.stateRow(rc_ec, sim_num)
+        bankruptcy: np.array = monitor.stateRow(rc_bk, sim_num)
+
+        disclosure_history: np.array = monitor.disclosure_history
+        reported_value: np.array = disclosure_history[day]
+
+        if isinstance(self._dist, DiscreteSimulationDistribution):
+            self._checkObservationBounds(current_k_idx, current_ecs, day)
+
+        workspace = self._workspace
+
+        if workspace is None or workspace["reported_mean"].shape != current_ecs.shape:
+            workspace = self._allocateWorkspace(current_ecs.shape)
+
+        # categories left out of the monitor's "categories" are staged in the workspace, but never stored
+        action_row: np.array = monitor.record(rc_action)[day] if monitor.isRecorded(rc_action) else workspace["disclosure"]
+        mrc_row: np.array = monitor.record(rc_mrc_daily)[day] if monitor.isRecorded(rc_mrc_daily) else workspace["mrc"]
+        investment_row: np.array = monitor.record(rc_investment_daily)[day] if monitor.isRecorded(rc_investment_daily) else None
+
+        reported_mean: np.array = workspace["reported_mean"]
+        scratch: np.array = workspace["scratch"]
+        mask: np.array = workspace["mask"]
+        int_scratch: np.array = workspace["int_scratch"]
+
+        # values are computed straight onto the day's records, unless their dtype is compacted
+        disclosure: np.array = action_row if action_row.dtype == workspace["disclosure"].dtype else workspace["disclosure"]
+        mrc_period: np.array = mrc_row if mrc_row.dtype == np.float64 else workspace["mrc"]
+        daily_investment: np.array = investment_row if investment_row is None or investment_row.dtype == np.float64 else workspace["investment"]
+
+        self.distribution.getActionInto(self._observationComponents(current_k_idx, current_ecs, day), disclosure, workspace["indices"])
+
+        np.equal(current_ecs, 10, out=mask)
+        np.copyto(disclosure, self._max_report_value, where=mask)
+
+        np.multiply(disclosure, self._normal_var, out=reported_value)
+
+        np.mean(disclosure_history[-1:(day-251):-1, :], axis=0, out=reported_mean)
+
+        np.multiply(reported_mean, current_k, out=mrc_period)
+        np.multiply(mrc_period, SQRT_10, out=mrc_period)
+
+        np.less(mrc_period, daily_return, out=mask)
+        np.add(bankruptcy, mask, out=bankruptcy, casting='unsafe')
+        np.minimum(bankruptcy, 1, out=bankruptcy)
+
+        np.negative(reported_value, out=scratch)
+        np.less(daily_return, scratch, out=mask)
+
+        if day == 249:
+            np.copyto(current_ecs, mask, casting='unsafe')
+        else:
+            np.add(current_ecs, mask, out=current_ecs, casting='unsafe')
+
+        np.multiply(bankruptcy, 11, out=int_scratch, casting='unsafe')
+        np.add(current_ecs, int_scratch, out=current_ecs, casting='unsafe')
+        np.minimum(current_ecs, 11, out=current_ecs)
 
-            # review the portfolio's return
-            annual_return: np.array = np.sum(daily_investment[:day+1,:] * asset_price * self._fixed_daily_return, axis=0)
-            monitor.addRecord(basel_record_categories.RETURN_ANNUAL,  annual_return, sim_num)
+        if daily_investment is not None:
+            np.divide(100000, mrc_period, out=daily_investment)
+            np.multiply(daily_investment, self._asset_price, out=daily_investment)
 
-            # the effective annual return
-            monitor.record(basel_record_categories.RETURN_EFFECTIVE_ANNUAL)[sim_num] = annual_return / annual_investment_avg
+        if disclosure is not action_row:
+            monitor.encodeActions(disclosure, out=action_row, scratch=scratch)
+        if mrc_period is not mrc_row:
+            np.copyto(mrc_row, mrc_period, casting='same_kind')
+        if daily_investment is not investment_row:
+            np.copyto(investment_row, daily_investment, casting='same_kind')
+
+        monitor.markModified(rc_ec, rc_bk, rc_disclosure, rc_action, rc_mrc_daily, rc_investment_daily)
+
+        if(done):
+            self._reviewYear(sim_num, day, current_ecs, bankruptcy, reported_mean)
+
+        monitor.recordEvents(sim_num, day, done)
+
+    def _performTransitionKernel(self, daily_return: np.ndarray, sim_state: np.ndarray) -> None:
+        '''Fused counterpart of performTransition, running the whole day step per path in one compiled pass.'''
+        monitor: BaselSimulationMonitor = self._monitor
+        sim_num: int = sim_state[0]
+        day: int = sim_state[1]
+        done: bool = sim_state[2]
+        basel_record_categories: Type[Enum] = BaselSimulationMonitor.BaselRecordCategory
+
+        rc_ec = basel_record_categories.EXCEEDENCES
+        rc_bk = basel_record_categories.BANKRUPTCY
+        rc_disclosure = basel_record_categories.DISCLOSURE
+        rc_action = basel_record_categories.ACTION
+        rc_mrc_daily = basel_record_categories.MRC_DAILY
+        rc_investment_daily = basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY
+
+        current_ecs: np.array = monitor.stateRow(rc_ec, sim_num)
+        bankruptcy: np.array = monitor.stateRow(rc_bk, sim_num)
+        disclosure_history: np.array = monitor.disclosure_history
+
+        self._checkObservationBounds(monitor.stateRow(basel_record_categories.KMULTIPLIERS_INDECES, sim_num), current_ecs, day)
+
+        workspace = self._workspace
+
+        if workspace is None or workspace["reported_mean"].shape != current_ecs.shape:
+            workspace = self._allocateWorkspace(current_ecs.shape)
+
+        reported_mean: np.array = workspace["reported_mean"]
+        # categories left out of the monitor's "categories" are written onto workspace buffers instead
+        action_row: np.array = monitor.record(rc_action)[day] if monitor.isRecorded(rc_action) else workspace["disclosure"]
+        mrc_row: np.array = monitor.record(rc_mrc_daily)[day] if monitor.isRecorded(rc_mrc_daily) else workspace["mrc"]
+        investment_row: np.array = monitor.record(rc_investment_daily)[day] if monitor.isRecorded(rc_investment_daily) else workspace["investment"]
+        disclosure: np.array = action_row if action_row.dtype == np.float64 else workspace["disclosure"]
+        policy_shape = self._dist.distributionFunction.shape
+        # same rows as disclosure_history[-1:(day-251):-1, :]
+        rows_start, rows_stop, rows_step = slice(-1, day - 251, -1).indices(disclosure_history.shape[0])
+
+        # the kernel runs over the flattened (policies x paths) axis, sharing the daily returns across policies
+        flat = lambda record: record.reshape(-1)
+
+        basel_day_kernel(self._dist.raveledDistributionFunction, policy_shape[-3], policy_shape[-2], policy_shape[-1], 249 - day,
+            float(self._max_report_value), float(self._normal_var), float(self._asset_price),
+            flat(monitor.stateRow(basel_record_categories.KMULTIPLIERS_INDECES, sim_num)),
+            flat(monitor.stateRow(basel_record_categories.KMULTIPLIERS_VALUE, sim_num)),
+            flat(current_ecs), flat(bankruptcy), np.asarray(daily_return, dtype=float),
+            disclosure_history.reshape(disclosure_history.shape[0], -1), day, rows_start, rows_stop, rows_step,
+            flat(disclosure), flat(mrc_row), flat(investment_row), flat(reported_mean))
+
+        if disclosure is not action_row:
+            monitor.encodeActions(disclosure, out=action_row, scratch=workspace["scratch"])
+
+        monitor.markModified(rc_ec, rc_bk, rc_disclosure, rc_action, rc_mrc_daily, rc_investment_daily)
+
+        if(done):
+            self._reviewYear(sim_num, day, current_ecs, bankruptcy, reported_mean)
+
+        monitor.recordEvents(sim_num, day, done)
+
+    def _observationComponents(self, current_k_idx: np.array, current_ecs: np.array, day: int) -> tuple:
+        '''Returns the policy lookup's observation components, leading with the policy index for stacked policies.'''
+        policy_count: int = getattr(self._dist, "policyCount", None)
+
+        if policy_count is None:
+            return (current_k_idx, current_ecs, 249 - day)
+
+        if self._policy_indices is None or self._policy_indices.shape[0] != policy_count:
+            self._policy_indices = np.arange(policy_count).reshape(policy_count, 1)
+
+        return (self._policy_indices, current_k_idx, current_ecs, 249 - day)
+
+    def _checkObservationBounds(self, current_k_idx: np.array, current_ecs: np.array, day: int) -> None:
+        '''Checks the policy table spans the day's observations, as np.ravel_multi_index does on the NumPy path,
+        since neither the workspace's raveled lookup nor the kernel's are bounds-checked.'''
+        policy_shape = self._dist.distributionFunction.shape[-3:]
+        ttob: int = 249 - day
+
+        if not 0 <= ttob < policy_shape[2]:
+            raise ValueError(self.__class__.__name__, ":performTransition invalid entry in coordinates array, day {} is out of the policy's {} days.".format(day, policy_shape[2]))
+
+        # the states only need scanning when the table is smaller than their range
+        if policy_shape[0] <= self._k_multipliers[1].max() and current_k_idx.max() >= policy_shape[0]:
+            raise ValueError(self.__class__.__name__, ":performTransition invalid entry in coordinates array, k multiplier index {} is out of the policy's {}.".format(current_k_idx.max(), policy_shape[0]))
+
+        if policy_shape[1] <= 11 and current_ecs.max() >= policy_shape[1]:
+            raise ValueError(self.__class__.__name__, ":performTransition invalid entry in coordinates array, exceedance count {} is out of the policy's {}.".format(current_ecs.max(), policy_shape[1]))
+
+    def _allocateWorkspace(self, shape: tuple) -> dict:
+        '''Pre-allocates the per-path scratch buffers used by the workspace day step.'''
+        policy_dtype = getattr(self._dist.distributionFunction, "dtype", np.dtype(float))
+
+        self._workspace = {
+            "reported_mean": np.empty(shape, dtype=float),
+            "disclosure": np.empty(shape, dtype=policy_dtype),
+            "mrc": np.empty(shape, dtype=float),
+            "investment": np.empty(shape, dtype=float),
+            "scratch": np.empty(shape, dtype=float),
+            "mask": np.empty(shape, dtype=bool),
+            "int_scratch": np.empty(shape, dtype=int),
+            "indices": np.empty(shape, dtype=np.intp),
+        }
+
+        return self._workspace
+
+    def _reviewYear(self, sim_num: int, day: int, current_ecs: np.array, bankruptcy: np.array, reported_mean: np.array) -> None:
+        '''Stores the year's statistics and reviews the k multiplier applicable on the following year.'''
+        monitor: BaselSimulationMonitor = self._monitor
+        basel_record_categories: Type[Enum] = BaselSimulationMonitor.BaselRecordCategory
+
+        rc_kmul_idx = basel_record_categories.KMULTIPLIERS_INDECES
+        rc_kmul_value = basel_record_categories.KMULTIPLIERS_VALUE
+        rc_bk = basel_record_categories.BANKRUPTCY
+
+        #review the k Multiplier applicable on the following year
+        reviewed_k_idx = (self._k_multipliers[1, current_ecs]).astype(int)
+        reviewed_k_val: np.array = self._k_multipliers[0, current_ecs]
+
+        monitor.stateRow(rc_kmul_idx, sim_num+1)[...] = reviewed_k_idx
+        monitor.stateRow(rc_kmul_value, sim_num+1)[...] = reviewed_k_val
+        monitor.stateRow(rc_bk, sim_num+1)[...] = bankruptcy
+
+        # store the year's average disclosure
+        if monitor.isRecorded(basel_record_categories.DISCLOSURE_ANNUAL_MEAN):
+            monitor.record(basel_record_categories.DISCLOSURE_ANNUAL_MEAN)[sim_num] = reported_mean
+
+        # store the year's average mrc
+        if monitor.isRecorded(basel_record_categories.MRC_ANNUAL):
+            monitor.record(basel_record_categories.MRC_ANNUAL)[sim_num] = monitor.record(basel_record_categories.MRC_DAILY).mean(axis=0)
 
+        monitor.markModified(rc_kmul_idx, rc_kmul_value, rc_bk,
+            basel_record_categories.DISCLOSURE_ANNUAL_MEAN, basel_record_categories.MRC_ANNUAL)
 
+        # review the investment amount considering a fixed daily return equal to 6%
+        # the annual and effective returns are derived lazily from it
+        if not monitor.isRecorded(basel_record_categories.PORTFOLIO_INVESTMENT_ANNUAL_AVG):
+            return
 
-        
\ No newline at end of file
+        daily_investment: np.array = monitor.record(basel_record_categories.PORTFOLIO_INVESTEMENT_DAILY)
+        self._annual_investment_days = day + 1
+        annual_investment_avg: np.array =  daily_investment[:day+1,:].mean(axis=0)
+        monitor.addRecord(basel_record_categories.PORTFOLIO_INVESTMENT_ANNUAL_AVG, annual_investment_avg, sim_num)
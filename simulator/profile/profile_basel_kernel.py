@@ -0,0 +1,72 @@
+'''Fused Basel day transition kernel.
+
+Numba is optional: when it is not installed NUMBA_AVAILABLE is False, basel_day_kernel is None and
+BaselSimulationProfile falls back on its in-place NumPy day step.
+'''
+
+from math import sqrt
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE: bool = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE: bool = False
+
+SQRT_10 = sqrt(10)
+
+def _baselDayKernel(policy, policy_dim_k, policy_dim_ecs, policy_dim_ttob, ttob, max_report_value, normal_var, asset_price,
+        k_idx, k_val, ecs, bankruptcy, daily_return, disclosure_history, day, rows_start, rows_stop, rows_step,
+        action, mrc_daily, investment_daily, reported_mean):
+    '''Performs a Basel day transition over every path, matching BaselSimulationProfile.performTransition.
+
+    action, mrc_daily and investment_daily are the day's rows of the respective records. For stacked
+    policies, the per-path arrays are flattened (policies x paths), the policy being p // len(daily_return). Rows
+    rows_start:rows_stop:rows_step of disclosure_history are averaged in that order, so the floating
+    point results are identical to NumPy's reduction.
+    '''
+    paths = ecs.shape[0]
+    return_paths = daily_return.shape[0]
+    reported_value = disclosure_history[day]
+    rows_count = len(range(rows_start, rows_stop, rows_step))
+
+    # policy lookup and disclosure
+    for p in range(paths):
+        disclosure = policy[((p // return_paths * policy_dim_k + k_idx[p]) * policy_dim_ecs + ecs[p]) * policy_dim_ttob + ttob]
+
+        #bankrupt states should always report the maximum value so as to avoid bankruptcy
+        if ecs[p] == 10:
+            disclosure = max_report_value
+
+        action[p] = disclosure
+        reported_value[p] = disclosure * normal_var
+
+    # row-wise accumulation of the disclosure history keeps memory accesses contiguous
+    reported_mean[:] = disclosure_history[rows_start]
+    for row in range(rows_start + rows_step, rows_stop, rows_step):
+        for p in range(paths):
+            reported_mean[p] += disclosure_history[row, p]
+
+    for p in range(paths):
+        mean = reported_mean[p] / rows_count
+        reported_mean[p] = mean
+
+        mrc_period = mean * k_val[p] * SQRT_10
+
+        #BC = MRC is below the loss
+        path_return = daily_return[p % return_paths]
+
+        bk = bankruptcy[p] + (1 if mrc_period < path_return else 0)
+        bk = min(bk, 1)
+
+        exceedance = 1 if path_return < -reported_value[p] else 0
+        ec = exceedance if day == 249 else ecs[p] + exceedance
+        ec = min(ec + bk * 11, 11)
+
+        ecs[p] = ec
+        bankruptcy[p] = bk
+
+        mrc_daily[p] = mrc_period
+        investment_daily[p] = 100000 / mrc_period * asset_price
+
+basel_day_kernel = njit(cache=True, nogil=True, error_model='numpy')(_baselDayKernel) if NUMBA_AVAILABLE else None
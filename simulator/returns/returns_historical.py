@@ -0,0 +1,129 @@
+from typing import Tuple
+
+import numpy as np
+
+class HistoricalReturnSource(object):
+    '''Bootstraps daily returns out of a memory-mapped historical returns file.
+
+    The file is never loaded as a whole: every draw gathers the sampled days' returns from the
+    memory map, so only the touched pages are read. Paths are resampled either with the stationary
+    bootstrap (blocks of geometrically distributed lengths, with mean block_length) or the moving
+    block bootstrap (blocks of block_length days). Blocks wrap around the end of the history.
+
+    Parameters
+    ----------
+    config : dict
+        path : str
+            The returns file, a .npy file or a raw binary file of dtype values.
+        dtype : optional
+            The raw file's dtype, by default float64.
+        column : int, optional
+            The returns' column, for 2-D (days x series) files, by default 0.
+        method : str, optional
+            "stationary" or "moving", by default "stationary".
+        block_length : int, optional
+            The (mean) block length in days, by default 10.
+        scale : float, optional
+            Multiplies the historical returns, e.g. to express them in standard deviations, by default 1.
+    '''
+
+    methods = ["stationary", "moving"]
+
+    def __init__(self, config: dict):
+        path: str = config.get("path", None)
+
+        if path is None:
+            raise ValueError(self.__class__.__name__, ":__init__ Missing returns file path.")
+
+        if path.endswith(".npy"):
+            returns = np.load(path, mmap_mode="r", allow_pickle=False)
+        else:
+            returns = np.memmap(path, dtype=config.get("dtype", np.float64), mode="r")
+
+        if returns.ndim == 2:
+            returns = returns[:, config.get("column", 0)]
+
+        self._returns: np.ndarray = returns
+        self._method: str = config.get("method", "stationary")
+        self._block_length: int = config.get("block_length", 10)
+        self._scale: float = config.get("scale", 1)
+
+        if not self._method in HistoricalReturnSource.methods:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid bootstrap method {}.".format(self._method))
+
+        if not self._block_length >= 1:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid block length {}.".format(self._block_length))
+
+        if len(self._returns) == 0:
+            raise ValueError(self.__class__.__name__, ":__init__ Empty returns file {}.".format(path))
+
+    def sample(self, days: int, paths: int, state: dict = None, subset: slice = None, random_state=None) -> Tuple[np.ndarray, dict]:
+        '''Bootstraps a (days, paths) block of returns.
+
+        The random draws are made for every path, and only the subset's paths are gathered, so that
+        a subset of paths (e.g. a chunk) is sampled identically to the same paths of a full draw.
+
+        Parameters
+        ----------
+        days : int
+            The number of days to sample.
+        paths : int
+            The number of paths the random draws are made for.
+        state : dict, optional
+            The state returned by the previous call, continuing the paths' blocks. If None, every
+            path starts a new block on the first day.
+        subset : slice, optional
+            The paths to sample, by default all of them.
+        random_state : np.random.Generator, optional
+            The generator the draws are made with, e.g. a block's stream (see PathRandomStreams), by default np.random.
+
+        Returns
+        -------
+        Tuple[np.ndarray, dict]
+            The (days, subset) returns and the state to continue from.
+        '''
+        history: int = len(self._returns)
+
+        if random_state is None:
+            uniform_draws: np.ndarray = np.random.rand(days, paths)
+            block_starts: np.ndarray = np.random.randint(0, history, size=(days, paths))
+        else:
+            uniform_draws = random_state.random((days, paths))
+            block_starts = random_state.integers(0, history, size=(days, paths))
+
+        if subset is not None:
+            uniform_draws = uniform_draws[:, subset]
+            block_starts = block_starts[:, subset]
+
+        day: int = 0 if state is None else state["day"]
+        day_indices: np.ndarray = np.arange(days).reshape(days, 1)
+
+        # the days on which a new block starts
+        if self._method == "stationary":
+            renew = uniform_draws < 1 / self._block_length
+        else:
+            renew = np.broadcast_to((day_indices + day) % self._block_length == 0, block_starts.shape).copy()
+
+        if state is None:
+            renew[0] = True
+            positions = np.zeros(block_starts.shape[1], dtype=np.int64)
+        else:
+            positions = state["positions"]
+
+        # each day's block start, -1 while continuing the previous call's blocks
+        last_renewal = np.maximum.accumulate(np.where(renew, day_indices, -1), axis=0)
+        base = np.where(last_renewal >= 0, np.take_along_axis(block_starts, np.maximum(last_renewal, 0), axis=0), positions)
+
+        indices = base + (day_indices - last_renewal)
+        indices %= history
+
+        returns = self._returns[indices.ravel()].reshape(indices.shape)
+
+        if self._scale != 1:
+            returns = returns * self._scale
+
+        return np.asarray(returns, dtype=float), {"positions": indices[-1], "day": day + days}
+
+    @property
+    def history_length(self) -> int:
+        return len(self._returns)
@@ -0,0 +1,241 @@
+'''Runs simulations from JSON configurations, e.g.
+
+{
+    "simulation_number": 30,
+    "trading_days": 250,
+    "simulation_years": 3000,
+    "day_order": "D",
+    "returns_distribution": {"mean": 0, "std": 1},
+    "seed": 42,
+    "records": {"compact": true},
+    "profiles": {
+        "basel": {"policy": "policy.npy", "max_report_value": 3}
+    }
+}
+
+Each profile is a BaselSimulationProfile driven by the DiscreteSimulationDistribution loaded from
+its policy file (relative paths, as the "returns_source" path, are resolved against the configuration's
+directory). A list of policy
+files is evaluated as a policy stack, adding a policy axis to the profile's records. Any other profile
+entry is passed on to the profile's constructor, and "records" is passed on to the monitors' "basel_records",
+e.g. {"categories": ["BANKRUPTCY", "RETURN_ANNUAL"]} only records (and computes) the listed categories.
+'''
+
+from typing import Callable, Dict, Tuple
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+from simulator.cache.cache_results import SimulationResultCache
+from simulator.distribution.distribution_discrete import DiscreteSimulationDistribution
+from simulator.monitor.monitor_base import SimulationMonitorBase
+from simulator.monitor.monitor_basel import BaselSimulationMonitor
+from simulator.profile.profile_basel import BaselSimulationProfile
+from simulator.simulator import MonteCarloSimulator
+
+# bump whenever the simulation dynamics change, so stale cache entries are never hit
+CACHE_VERSION = 2
+
+def loadPolicy(path: str) -> np.ndarray:
+    return np.load(path, allow_pickle=False)
+
+def loadPolicies(config: dict, base_dir: str = ".", load: Callable[[str], np.ndarray] = loadPolicy) -> Dict[str, np.ndarray]:
+    '''Loads the policy table of every profile in the configuration, through load (e.g. a caching loader).'''
+    policies = {}
+
+    for profile_name, profile_config in config.get("profiles", {}).items():
+        policy_path = profile_config.get("policy", None)
+
+        if policy_path is None:
+            raise ValueError("runner:loadPolicies Missing policy for profile {}.".format(profile_name))
+
+        if isinstance(policy_path, list):
+            # a list of policies is evaluated as a policy stack
+            policies[profile_name] = np.stack([load(os.path.join(base_dir, path)) for path in policy_path])
+        else:
+            policies[profile_name] = load(os.path.join(base_dir, policy_path))
+
+    return policies
+
+def resolvePaths(config: dict, base_dir: str = ".") -> dict:
+    '''Returns the configuration with its returns file path resolved against base_dir, as loadPolicies
+    resolves the policy paths.'''
+    returns_source = config.get("returns_source", None)
+
+    if returns_source is None or returns_source.get("path", None) is None:
+        return config
+
+    return dict(config, returns_source=dict(returns_source,
+        path=os.path.abspath(os.path.join(base_dir, returns_source["path"]))))
+
+def fileDigest(path: str) -> str:
+    '''SHA-256 of a file's contents.'''
+    file_hash = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+def configDigest(config: dict, policies: Dict[str, np.ndarray]) -> str:
+    '''Content address of a configuration: the configuration itself, minus the policy and returns file
+    paths, plus the policy tables' and the returns file's contents.'''
+    hashed_config = dict(config)
+    hashed_config["profiles"] = {profile_name: {key: value for key, value in profile_config.items() if key != "policy"}
+        for profile_name, profile_config in config.get("profiles", {}).items()}
+
+    returns_source = config.get("returns_source", None)
+
+    if returns_source is not None and returns_source.get("path", None) is not None:
+        hashed_config["returns_source"] = dict({key: value for key, value in returns_source.items() if key != "path"},
+            digest=fileDigest(returns_source["path"]))
+
+    hashed_config["cache_version"] = CACHE_VERSION
+
+    return SimulationResultCache.digest(hashed_config, policies)
+
+def recordKey(profile_name: str, category) -> str:
+    return "{}/{}".format(profile_name, getattr(category, "name", category))
+
+def collectRecords(monitors: Dict[str, SimulationMonitorBase]) -> Dict[str, np.ndarray]:
+    '''Flattens the monitors' records into a "profile/category" keyed dictionary.'''
+    records = {}
+
+    for profile_name, monitor in monitors.items():
+        for category in monitor.categories():
+            record = monitor.record(category)
+
+            if isinstance(record, np.ndarray):
+                records[recordKey(profile_name, category)] = record
+
+    return records
+
+def buildSimulation(config: dict, policies: Dict[str, np.ndarray], paths: slice = None) -> Tuple[MonteCarloSimulator, Dict[str, BaselSimulationMonitor]]:
+    '''Sets up the simulator and the profiles' monitors described by config, without running it.
+
+    The monitors' records span every path, or the specified range of paths only (e.g. a shard's).
+    '''
+    simulator = MonteCarloSimulator(config)
+    years = config.get("simulation_number", 3000)
+    path_count = config.get("simulation_years", 30)
+
+    if paths is not None:
+        path_count = len(range(*paths.indices(path_count)))
+    monitor_config = {
+        "default_records": {"record_shape": (1, )},
+        "basel_records": dict(config.get("records", {}),
+            record_shape=(years, path_count),
+            daily_disclosure_record_shape=(config.get("trading_days", 250), path_count))}
+
+    monitors = {}
+
+    for profile_name, profile_config in config.get("profiles", {}).items():
+        profile_config = dict(profile_config)
+        profile_config.setdefault("returns_distribution", config.get("returns_distribution", {}))
+        policy_stack = isinstance(profile_config.get("policy", None), list)
+
+        profile_monitor_config = dict(monitor_config)
+        if policy_stack:
+            profile_monitor_config["basel_records"] = dict(monitor_config["basel_records"], policy_count=policies[profile_name].shape[0])
+
+        monitors[profile_name] = BaselSimulationMonitor(profile_monitor_config)
+        simulator.createAndAddSimulationProfile(profile_name, BaselSimulationProfile,
+            DiscreteSimulationDistribution({"distribution_function": policies[profile_name], "policy_stack": policy_stack}),
+            monitors[profile_name], profile_config)
+
+    return simulator, monitors
+
+def runSimulation(config: dict, policies: Dict[str, np.ndarray], progress: Callable[[int, int], None] = None,
+        paths: slice = None) -> Dict[str, np.ndarray]:
+    '''Runs the simulation described by config.
+
+    Parameters
+    ----------
+    config : dict
+        The simulation configuration, see the module's documentation.
+    policies : Dict[str, np.ndarray]
+        The policy table of every profile.
+    progress : Callable[[int, int], None], optional
+        Notified of the simulation's progress, see MonteCarloSimulator.progress_callback.
+    paths : slice, optional
+        Simulates the specified range of paths only, see MonteCarloSimulator.startSimulation.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        The records of every profile, keyed by "profile/category".
+    '''
+    simulator, monitors = buildSimulation(config, policies, paths)
+    simulator.progress_callback = progress
+
+    seed = config.get("seed", None)
+    if seed is not None:
+        np.random.seed(seed)
+
+    simulator.startSimulation(paths)
+
+    return collectRecords(monitors)
+
+def runCached(config: dict, policies: Dict[str, np.ndarray], cache: SimulationResultCache = None,
+        progress: Callable[[int, int], None] = None) -> Tuple[Dict[str, np.ndarray], bool]:
+    '''Runs the simulation described by config, unless its records are already cached.
+
+    Returns
+    -------
+    Tuple[Dict[str, np.ndarray], bool]
+        The records and whether they were retrieved from the cache.
+    '''
+    if cache is None:
+        return runSimulation(config, policies, progress), False
+
+    if config.get("seed", None) is None:
+        logging.warning("runner:runCached Unseeded simulations are not cached.")
+        return runSimulation(config, policies, progress), False
+
+    key = configDigest(config, policies)
+    records = cache.get(key)
+
+    if records is not None:
+        return records, True
+
+    records = runSimulation(config, policies, progress)
+    cache.put(key, records)
+
+    return records, False
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Runs a Monte Carlo simulation from a JSON configuration.")
+    parser.add_argument("config", help="the JSON simulation configuration")
+    parser.add_argument("-o", "--output", help="writes the records to the specified .npz file")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "basel-gym"),
+        help="the result cache directory")
+    parser.add_argument("--cache-size", type=int, default=1 << 30, help="the maximum cache size, in bytes")
+    parser.add_argument("--no-cache", action="store_true", help="always run the simulation")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r") as config_file:
+        config = json.load(config_file)
+
+    base_dir = os.path.dirname(os.path.abspath(args.config))
+    config = resolvePaths(config, base_dir)
+    policies = loadPolicies(config, base_dir)
+    cache = None if args.no_cache else SimulationResultCache(args.cache_dir, args.cache_size)
+
+    records, hit = runCached(config, policies, cache)
+
+    if args.output:
+        np.savez(args.output, **records)
+
+    print("{} {}".format("hit" if hit else "miss", configDigest(config, policies)))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,479 @@
+'''Local simulation service, keeping warm worker processes with preloaded policy tables.
+
+The service listens on a Unix socket or on a localhost TCP port and speaks newline delimited JSON.
+Requests are objects with an "op":
+
+{"op": "submit", "job": {...}, "priority": 0, "base_dir": "/path", "output": "records.npz"}
+    Queues a job, "job" being a runner configuration (see simulator/runner.py). Higher (integer)
+    priorities run first, jobs of equal priority run in submission order. Relative policy paths are
+    resolved against base_dir. The records are written onto output (a .npz file within the service's
+    output directory) when set, otherwise they are sent back base64 encoded (see decodeRecords).
+{"op": "cancel", "job": 1}
+    Cancels a queued job.
+{"op": "status"}
+    Reports the queued and running jobs.
+
+The service answers with event objects, those of a job being streamed on the connection that
+submitted it: "queued", "started", "progress" (simulated and total path-years), then "result",
+"failed" or "cancelled". Invalid requests are answered with an "error" event.
+
+    python -m simulator.service --socket /tmp/basel.sock --workers 4 --preload policy.npy --output-dir /tmp/records
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Callable, Dict, List
+
+import argparse
+import asyncio
+import base64
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+
+import numpy as np
+
+from simulator.cache.cache_results import SimulationResultCache
+from simulator.runner import loadPolicies, loadPolicy, resolvePaths, runCached
+
+# worker process state, set up by _initWorker
+_worker_policies: Dict[tuple, np.ndarray] = {}
+_worker_cache: SimulationResultCache = None
+_worker_progress = None
+
+def _initWorker(preload: List[str], cache_dir: str, cache_size: int, progress_queue) -> None:
+    global _worker_cache, _worker_progress
+
+    _worker_cache = None if cache_dir is None else SimulationResultCache(cache_dir, cache_size)
+    _worker_progress = progress_queue
+
+    for path in preload:
+        _loadWorkerPolicy(path)
+
+def _loadWorkerPolicy(path: str) -> np.ndarray:
+    '''Loads a policy table, reusing the worker's copy unless the file was modified since.'''
+    path = os.path.abspath(path)
+    key = (path, os.stat(path).st_mtime_ns)
+    policy = _worker_policies.get(key)
+
+    if policy is None:
+        policy = _worker_policies[key] = loadPolicy(path)
+
+    return policy
+
+def _pingWorker() -> int:
+    return os.getpid()
+
+def _runJob(job_id: int, config: dict, base_dir: str, output: str = None) -> dict:
+    '''Runs a job, returning its result, or its error as {"error": message}.
+
+    The job's progress stream is ended by a (job_id, None, None) notification, sent once the job is
+    over, so that the service forwards all of its progress ahead of the result.
+    '''
+    try:
+        config = resolvePaths(config, base_dir)
+        policies = loadPolicies(config, base_dir, _loadWorkerPolicy)
+        records, hit = runCached(config, policies, _worker_cache,
+            lambda done, total: _worker_progress.put((job_id, done, total)))
+
+        result = {"cached": hit, "records": {key: list(record.shape) for key, record in records.items()}}
+
+        if output is not None:
+            np.savez(output, **records)
+            result["output"] = output
+        else:
+            buffer = io.BytesIO()
+            np.savez(buffer, **records)
+            result["npz"] = base64.b64encode(buffer.getvalue()).decode("ascii")
+
+        return result
+    except Exception as error:
+        return {"error": repr(error)}
+    finally:
+        _worker_progress.put((job_id, None, None))
+
+def decodeRecords(result: dict) -> Dict[str, np.ndarray]:
+    '''Decodes the records of a "result" event, reading them from its output file if it has one.'''
+    if "output" in result:
+        source = result["output"]
+    else:
+        source = io.BytesIO(base64.b64decode(result["npz"]))
+
+    with np.load(source, allow_pickle=False) as records:
+        return {key: records[key] for key in records.files}
+
+class SimulationService(object):
+    '''Serves simulation jobs from a priority queue on a pool of warm worker processes.
+
+    Parameters
+    ----------
+    config : dict
+        socket : str, optional
+            The Unix socket path to listen on. If not set, the service listens on localhost.
+        port : int, optional
+            The localhost TCP port to listen on, by default 0 (any free port, see address).
+        workers : int, optional
+            The number of worker processes, by default the number of CPUs.
+        preload : list, optional
+            Policy files loaded by every worker on startup.
+        cache_dir : str, optional
+            The workers' result cache directory, no caching if not set.
+        cache_size : int, optional
+            The result cache's maximum size, in bytes, by default 1 GiB.
+        output_dir : str, optional
+            The directory jobs write their records onto, the submitted outputs being relative to it.
+            Jobs submitted with an output are rejected if not set.
+    '''
+
+    # terminal job events
+    FINAL_EVENTS = ("result", "failed", "cancelled")
+
+    def __init__(self, config: dict = {}):
+        self._socket_path: str = config.get("socket", None)
+        self._port: int = config.get("port", 0)
+        self._workers: int = config.get("workers", os.cpu_count() or 1)
+        self._preload: List[str] = [os.path.abspath(path) for path in config.get("preload", [])]
+        self._cache_dir: str = config.get("cache_dir", None)
+        self._cache_size: int = config.get("cache_size", 1 << 30)
+        output_dir: str = config.get("output_dir", None)
+        self._output_dir: str = None if output_dir is None else os.path.realpath(output_dir)
+
+        if not self._workers > 0:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid number of workers {}.".format(self._workers))
+
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs: Dict[int, dict] = {}
+        self._job_ids = itertools.count(1)
+        self._queue: asyncio.PriorityQueue = None
+        self._server: asyncio.AbstractServer = None
+        self._pool: ProcessPoolExecutor = None
+        self._progress_queue = None
+        self._progress_thread: threading.Thread = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop = None
+
+    async def startService(self) -> None:
+        '''Starts the worker processes, waiting for them to be warm, then starts listening.'''
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._startProgress()
+        self._pool = self._createPool()
+
+        await asyncio.gather(*[self._loop.run_in_executor(self._pool, _pingWorker) for _ in range(self._workers)])
+
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self._workers)]
+
+        if self._socket_path is not None:
+            self._server = await asyncio.start_unix_server(self._handleConnection, path=self._socket_path)
+        else:
+            self._server = await asyncio.start_server(self._handleConnection, host="127.0.0.1", port=self._port)
+
+    async def stopService(self) -> None:
+        '''Stops listening and shuts the workers down, dropping the queued jobs.'''
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+
+        if self._pool is not None:
+            await self._loop.run_in_executor(None, lambda: self._pool.shutdown(cancel_futures=True))
+            self._pool = None
+
+        if self._progress_thread is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join()
+            self._progress_thread = None
+
+        if self._socket_path is not None and os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+    async def serveForever(self, started: Callable[['SimulationService'], None] = None) -> None:
+        '''Serves until cancelled, notifying started once the service listens.'''
+        await self.startService()
+
+        if started is not None:
+            started(self)
+
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stopService()
+
+    @property
+    def address(self):
+        '''The Unix socket path, or the (host, port) the service listens on.'''
+        if self._socket_path is not None:
+            return self._socket_path
+
+        return None if self._server is None else self._server.sockets[0].getsockname()[:2]
+
+    def _createPool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=self._context, initializer=_initWorker,
+            initargs=(self._preload, self._cache_dir, self._cache_size, self._progress_queue))
+
+    def _startProgress(self) -> None:
+        '''Creates the workers' progress queue, for the next pool, and the thread forwarding it.'''
+        self._progress_queue = self._context.SimpleQueue()
+        self._progress_thread = threading.Thread(target=self._forwardProgress, args=(self._progress_queue, ), daemon=True)
+        self._progress_thread.start()
+
+    def _forwardProgress(self, progress_queue) -> None:
+        '''Forwards the workers' progress notifications onto the event loop, until the None sentinel
+        or until the queue is closed.'''
+        while True:
+            try:
+                progress = progress_queue.get()
+            except (EOFError, OSError):
+                return
+
+            if progress is None:
+                return
+
+            self._loop.call_soon_threadsafe(self._notifyProgress, *progress)
+
+    def _notifyProgress(self, job_id: int, done: int, total: int) -> None:
+        job = self._jobs.get(job_id)
+
+        if job is not None:
+            job["progress"].put_nowait(None if done is None else (done, total))
+
+    async def _sendProgress(self, job: dict) -> None:
+        '''Sends the job's progress events in order, until its progress stream ends, see _runJob.'''
+        while True:
+            progress = await job["progress"].get()
+
+            if progress is None:
+                return
+
+            await self._send(job["writer"], {"event": "progress", "job": job["id"], "done": progress[0], "total": progress[1]})
+
+    async def _dispatch(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            job_id = job["id"]
+
+            if job["state"] != "queued":
+                self._jobs.pop(job_id, None)
+                continue
+
+            job["state"] = "running"
+            await self._send(job["writer"], {"event": "started", "job": job_id})
+
+            pool = self._pool
+            progress = asyncio.create_task(self._sendProgress(job))
+
+            try:
+                result = await self._loop.run_in_executor(pool, _runJob, job_id, job["config"], job["base_dir"], job["output"])
+                # the job's progress stream ends once it is over, its last progress being sent ahead of the result
+                await progress
+            except BrokenProcessPool as error:
+                # every job running on the broken pool fails, the first one to notice restarts it
+                if self._pool is pool:
+                    logging.error("SimulationService:_dispatch Worker pool broken, restarting it.")
+                    # a worker that died holding the progress queue's lock would block every later put (and the
+                    # None sentinel), so the new pool gets its own queue, the old one's forwarder ending as it is closed
+                    progress_queue = self._progress_queue
+                    self._startProgress()
+                    self._pool = self._createPool()
+                    pool.shutdown(wait=False)
+                    progress_queue.close()
+                await self._send(job["writer"], {"event": "failed", "job": job_id, "message": repr(error)})
+            except Exception as error:
+                await self._send(job["writer"], {"event": "failed", "job": job_id, "message": repr(error)})
+            else:
+                if "error" in result:
+                    await self._send(job["writer"], {"event": "failed", "job": job_id, "message": result["error"]})
+                else:
+                    await self._send(job["writer"], dict(result, event="result", job=job_id))
+            finally:
+                progress.cancel()
+                self._jobs.pop(job_id, None)
+
+    async def _handleConnection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await self._send(writer, {"event": "error", "message": "Invalid JSON request."})
+                    continue
+
+                op = request.get("op", None) if isinstance(request, dict) else None
+
+                if op == "submit":
+                    await self._submit(request, writer)
+                elif op == "cancel":
+                    await self._cancel(request.get("job", None), writer)
+                elif op == "status":
+                    await self._send(writer, {"event": "status",
+                        "queued": [job_id for job_id, job in self._jobs.items() if job["state"] == "queued"],
+                        "running": [job_id for job_id, job in self._jobs.items() if job["state"] == "running"]})
+                else:
+                    await self._send(writer, {"event": "error", "message": "Unknown op {}.".format(op)})
+        except ConnectionError:
+            pass
+        finally:
+            # nobody is left to receive the results of the connection's queued jobs
+            for job_id, job in list(self._jobs.items()):
+                if job["writer"] is writer and job["state"] == "queued":
+                    job["state"] = "cancelled"
+                    self._jobs.pop(job_id)
+
+            writer.close()
+
+    async def _submit(self, request: dict, writer: asyncio.StreamWriter) -> None:
+        config = request.get("job", None)
+
+        if not isinstance(config, dict) or not config.get("profiles", None):
+            await self._send(writer, {"event": "error", "message": "Missing job configuration or profiles."})
+            return
+
+        priority = request.get("priority", 0)
+
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            await self._send(writer, {"event": "error", "message": "Invalid priority {}.".format(json.dumps(priority))})
+            return
+
+        base_dir = request.get("base_dir", ".")
+
+        if not isinstance(base_dir, str) or not os.path.isdir(base_dir):
+            await self._send(writer, {"event": "error", "message": "Invalid base_dir {}.".format(json.dumps(base_dir))})
+            return
+
+        output = request.get("output", None)
+
+        if output is not None:
+            output = self._outputPath(output)
+
+            if output is None:
+                await self._send(writer, {"event": "error", "message": "Invalid output {}.".format(json.dumps(request["output"]))})
+                return
+
+        job_id = next(self._job_ids)
+
+        self._jobs[job_id] = job = {
+            "id": job_id,
+            "state": "queued",
+            "config": config,
+            "base_dir": base_dir,
+            "output": output,
+            "writer": writer,
+            "progress": asyncio.Queue()}
+
+        await self._send(writer, {"event": "queued", "job": job_id, "priority": priority})
+        self._queue.put_nowait((-priority, job_id, job))
+
+    def _outputPath(self, output) -> str:
+        '''Resolves an output against the output directory, None if it is invalid or lies outside of it.'''
+        if self._output_dir is None or not isinstance(output, str) or not output:
+            return None
+
+        path = os.path.realpath(os.path.join(self._output_dir, output))
+
+        return path if os.path.commonpath((path, self._output_dir)) == self._output_dir and path != self._output_dir else None
+
+    async def _cancel(self, job_id: int, writer: asyncio.StreamWriter) -> None:
+        job = self._jobs.get(job_id, None)
+
+        if job is None or job["state"] != "queued":
+            await self._send(writer, {"event": "error", "message": "Job {} is not queued.".format(job_id)})
+            return
+
+        job["state"] = "cancelled"
+        self._jobs.pop(job_id)
+        await self._send(job["writer"], {"event": "cancelled", "job": job_id})
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, message: dict) -> None:
+        if writer.is_closing():
+            return
+
+        try:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+async def connectService(address, limit: int = 1 << 30):
+    '''Opens a connection to the service at address, a Unix socket path or a (host, port) pair.'''
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address, limit=limit)
+
+    return await asyncio.open_connection(*address, limit=limit)
+
+async def submitJob(address, job: dict, priority: int = 0, base_dir: str = None, output: str = None) -> AsyncIterator[dict]:
+    '''Submits a job to the service at address, yielding its events up to the final one.
+
+    e.g.
+        async for event in submitJob("/tmp/basel.sock", config):
+            if event["event"] == "result":
+                records = decodeRecords(event)
+    '''
+    reader, writer = await connectService(address)
+
+    try:
+        request = {"op": "submit", "job": job, "priority": priority, "base_dir": base_dir or os.getcwd(), "output": output}
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+
+        while True:
+            line = await reader.readline()
+
+            if not line:
+                raise ConnectionError("submitJob: Connection closed by the service.")
+
+            event = json.loads(line)
+            yield event
+
+            if event["event"] in SimulationService.FINAL_EVENTS + ("error", ):
+                return
+    finally:
+        writer.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serves simulation jobs on warm worker processes.")
+    parser.add_argument("--socket", help="listens on the specified Unix socket")
+    parser.add_argument("--port", type=int, default=8765, help="listens on the specified localhost port, unless --socket is set")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="the number of worker processes")
+    parser.add_argument("--preload", nargs="*", default=[], help="policy files preloaded by every worker")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "basel-gym"),
+        help="the result cache directory")
+    parser.add_argument("--cache-size", type=int, default=1 << 30, help="the maximum cache size, in bytes")
+    parser.add_argument("--no-cache", action="store_true", help="always run the simulations")
+    parser.add_argument("--output-dir", help="the directory jobs may write their records onto")
+    args = parser.parse_args(argv)
+
+    service = SimulationService({
+        "socket": args.socket,
+        "port": args.port,
+        "workers": args.workers,
+        "preload": args.preload,
+        "cache_dir": None if args.no_cache else args.cache_dir,
+        "cache_size": args.cache_size,
+        "output_dir": args.output_dir})
+
+    try:
+        asyncio.run(service.serveForever(lambda service: print("Listening on {}".format(service.address), flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+'''Distributed simulations over a shared filesystem queue.
+
+A coordinator splits a runner configuration (see simulator/runner.py) into shards of paths, each
+described by a JSON file in the queue directory:
+
+    queue/job.json              the configuration, seeded
+    queue/policies.npz          the profiles' policy tables
+    queue/returns.<ext>         the historical returns file, if any (see returns_source)
+    queue/pending/<shard>.json  shards waiting for a worker
+    queue/claimed/<shard>.json  shards being simulated, touched periodically by their worker
+    queue/done/<shard>.json     simulated shards, along with their path record keys
+    queue/records/<shard>.npz   the shards' records
+
+Workers, on any node sharing the directory, claim pending shards by atomically renaming them onto
+claimed/. Claims that were not touched for lease seconds are deemed to belong to dead workers and
+are moved back onto pending/, and a slow worker whose claim was reclaimed neither publishes its shard
+nor releases the shard's new claim. Every block of paths draws from its own stream of the seeded random
+streams (see stream_block_paths, by default a shard's paths), so a shard only draws its own paths'
+numbers, its records are the same whichever worker simulates it, and the merged records match those
+of a single run of the job's configuration.
+
+    python -m simulator.shards submit config.json queue --shard-paths 10000
+    python -m simulator.shards worker queue
+    python -m simulator.shards merge queue -o records.npz
+'''
+
+from typing import Dict, List
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from simulator.monitor.monitor_base import SimulationMonitorBase
+from simulator.monitor.monitor_basel import BaselSimulationMonitor
+from simulator.runner import buildSimulation, loadPolicies, recordKey, resolvePaths
+
+QUEUE_STATES = ("pending", "claimed", "done")
+
+def _shardName(index: int) -> str:
+    return "{:06d}.json".format(index)
+
+def _writeAtomically(path: str, write) -> None:
+    '''Writes a file through a temporary file in the same directory, so readers never see partial files.'''
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            write(temp_file)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def _writeJson(path: str, content: dict) -> None:
+    _writeAtomically(path, lambda file: file.write(json.dumps(content).encode()))
+
+def _readJson(path: str) -> dict:
+    with open(path, "r") as json_file:
+        return json.load(json_file)
+
+def submitShards(queue_dir: str, config: dict, policies: Dict[str, np.ndarray], shard_paths: int, base_dir: str = ".") -> int:
+    '''Writes the shard descriptors of a simulation onto an empty queue directory.
+
+    Parameters
+    ----------
+    queue_dir : str
+        The queue directory, shared by the coordinator and the workers.
+    config : dict
+        The runner configuration. A seed is drawn when it has none, as every shard must draw from the same
+        random streams, and stream_block_paths defaults to shard_paths.
+    policies : Dict[str, np.ndarray]
+        The policy table of every profile.
+    shard_paths : int
+        The number of paths per shard.
+    base_dir : str, optional
+        The directory the returns file path is relative to, by default the current directory. The returns
+        file is copied onto the queue directory, for the workers to read it.
+
+    Returns
+    -------
+    int
+        The number of shards.
+    '''
+    if not shard_paths > 0:
+        raise ValueError("shards:submitShards Invalid number of paths per shard {}.".format(shard_paths))
+
+    if os.path.exists(os.path.join(queue_dir, "job.json")):
+        raise ValueError("shards:submitShards Queue directory {} already holds a job.".format(queue_dir))
+
+    for directory in QUEUE_STATES + ("records", ):
+        os.makedirs(os.path.join(queue_dir, directory), exist_ok=True)
+
+    config = dict(config)
+
+    if config.get("seed", None) is None:
+        config["seed"] = int(np.random.SeedSequence().entropy % (1 << 32))
+
+    # shards spanning whole stream blocks only draw their own paths' random numbers
+    if config.get("stream_block_paths", None) is None:
+        config["stream_block_paths"] = shard_paths
+
+    total_paths = config.get("simulation_years", 30)
+    shards = range(0, total_paths, shard_paths)
+
+    _writeAtomically(os.path.join(queue_dir, "policies.npz"), lambda file: np.savez(file, **policies))
+
+    returns_source = config.get("returns_source", None)
+
+    if returns_source is not None and returns_source.get("path", None) is not None:
+        # kept relative to the queue directory, which workers on other nodes may mount elsewhere
+        returns_path = resolvePaths(config, base_dir)["returns_source"]["path"]
+        returns_name = "returns" + os.path.splitext(returns_path)[1]
+
+        def copyReturns(file):
+            with open(returns_path, "rb") as returns_file:
+                shutil.copyfileobj(returns_file, file)
+
+        _writeAtomically(os.path.join(queue_dir, returns_name), copyReturns)
+        config["returns_source"] = dict(returns_source, path=returns_name)
+
+    for index, start in enumerate(shards):
+        _writeJson(os.path.join(queue_dir, "pending", _shardName(index)),
+            {"shard": index, "start": start, "stop": min(start + shard_paths, total_paths), "seed": config["seed"]})
+
+    # written last, workers wait for it
+    _writeJson(os.path.join(queue_dir, "job.json"), dict(config, shard_count=len(shards)))
+
+    return len(shards)
+
+def shardStatus(queue_dir: str) -> Dict[str, int]:
+    '''Counts the pending, claimed and done shards.'''
+    return {state: len([name for name in os.listdir(os.path.join(queue_dir, state)) if name.endswith(".json")])
+        for state in QUEUE_STATES}
+
+def reclaimShards(queue_dir: str, lease: float) -> List[int]:
+    '''Moves the claims that were not touched for lease seconds back onto pending/.'''
+    reclaimed = []
+    now = time.time()
+
+    for name in sorted(os.listdir(os.path.join(queue_dir, "claimed"))):
+        if not name.endswith(".json"):
+            continue
+
+        claimed_path = os.path.join(queue_dir, "claimed", name)
+
+        try:
+            if now - os.stat(claimed_path).st_mtime < lease:
+                continue
+
+            # only one of several reclaiming workers wins the rename
+            os.rename(claimed_path, os.path.join(queue_dir, "pending", name))
+            reclaimed.append(int(name.split(".")[0]))
+        except FileNotFoundError:
+            pass
+
+    return reclaimed
+
+def claimShard(queue_dir: str, worker_id: str) -> dict:
+    '''Claims a pending shard, returning its descriptor, None if there is none left.'''
+    for name in sorted(os.listdir(os.path.join(queue_dir, "pending"))):
+        if not name.endswith(".json"):
+            continue
+
+        pending_path = os.path.join(queue_dir, "pending", name)
+        claimed_path = os.path.join(queue_dir, "claimed", name)
+
+        if os.path.exists(os.path.join(queue_dir, "done", name)):
+            # finished meanwhile by the worker it was reclaimed from
+            try:
+                os.unlink(pending_path)
+            except FileNotFoundError:
+                pass
+            continue
+
+        try:
+            os.rename(pending_path, claimed_path)
+            # renaming keeps the submission's mtime, which would make the claim look stale
+            os.utime(claimed_path)
+        except FileNotFoundError:
+            # claimed (or reclaimed) by another worker
+            continue
+
+        descriptor = _readJson(claimed_path)
+        descriptor["worker"] = worker_id
+        # tells this claim apart from later claims of the same shard, once reclaimed
+        descriptor["claim"] = uuid.uuid4().hex
+        _writeJson(claimed_path, descriptor)
+
+        return descriptor
+
+    return None
+
+def _ownsClaim(claimed_path: str, claim: str) -> bool:
+    '''Whether a claim is still held, i.e. its shard was not reclaimed (and possibly claimed again) meanwhile.'''
+    try:
+        return _readJson(claimed_path).get("claim", None) == claim
+    except FileNotFoundError:
+        return False
+
+def _heartbeat(claimed_path: str, claim: str, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        if not _ownsClaim(claimed_path, claim):
+            # reclaimed, the claimed file is no longer ours to touch
+            return
+
+        try:
+            os.utime(claimed_path)
+        except FileNotFoundError:
+            return
+
+def runShard(queue_dir: str, descriptor: dict, lease: float = 60) -> bool:
+    '''Simulates a claimed shard, writing its records and moving it onto done/.
+
+    Returns whether the shard was published, False when its lease expired and it was reclaimed meanwhile,
+    in which case its new claimant publishes it.
+    '''
+    config = resolvePaths(_readJson(os.path.join(queue_dir, "job.json")), queue_dir)
+    name = _shardName(descriptor["shard"])
+    claimed_path = os.path.join(queue_dir, "claimed", name)
+
+    with np.load(os.path.join(queue_dir, "policies.npz"), allow_pickle=False) as policy_files:
+        policies = {profile_name: policy_files[profile_name] for profile_name in policy_files.files}
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(claimed_path, descriptor["claim"], lease / 4, stop), daemon=True)
+    heartbeat.start()
+
+    try:
+        paths = slice(descriptor["start"], descriptor["stop"])
+        simulator, monitors = buildSimulation(config, policies, paths)
+
+        np.random.seed(descriptor["seed"])
+        simulator.startSimulation(paths)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    records = {}
+    path_keys = []
+
+    for profile_name, monitor in monitors.items():
+        for category in monitor.categories():
+            record = monitor.record(category)
+
+            if isinstance(record, np.ndarray):
+                records[recordKey(profile_name, category)] = record
+
+                if monitor.isPathRecord(category):
+                    path_keys.append(recordKey(profile_name, category))
+
+    if not _ownsClaim(claimed_path, descriptor["claim"]):
+        return False
+
+    _writeAtomically(os.path.join(queue_dir, "records", name.replace(".json", ".npz")), lambda file: np.savez(file, **records))
+    _writeJson(os.path.join(queue_dir, "done", name), dict(descriptor, path_keys=path_keys))
+
+    # checked again, as the shard may have been reclaimed while its records were written
+    if _ownsClaim(claimed_path, descriptor["claim"]):
+        try:
+            os.unlink(claimed_path)
+        except FileNotFoundError:
+            pass
+
+    return True
+
+def runWorker(queue_dir: str, worker_id: str = None, lease: float = 60, poll: float = 1, wait: float = 0) -> int:
+    '''Claims and simulates shards until every shard is done.
+
+    Parameters
+    ----------
+    queue_dir : str
+        The queue directory.
+    worker_id : str, optional
+        The worker's identifier, recorded on its claims, by default host-pid.
+    lease : float, optional
+        The seconds after which untouched claims are reclaimed, by default 60.
+    poll : float, optional
+        The seconds between two polls of the queue while other workers hold the remaining shards, by default 1.
+    wait : float, optional
+        The seconds to wait for a job to be submitted onto the queue, by default 0.
+
+    Returns
+    -------
+    int
+        The number of shards simulated by the worker.
+    '''
+    worker_id = worker_id or "{}-{}".format(socket.gethostname(), os.getpid())
+    deadline = time.time() + wait
+
+    while not os.path.exists(os.path.join(queue_dir, "job.json")):
+        if time.time() >= deadline:
+            raise ValueError("shards:runWorker No job submitted onto {}.".format(queue_dir))
+        time.sleep(poll)
+
+    shard_count = _readJson(os.path.join(queue_dir, "job.json"))["shard_count"]
+    simulated = 0
+
+    while True:
+        descriptor = claimShard(queue_dir, worker_id)
+
+        if descriptor is not None:
+            simulated += runShard(queue_dir, descriptor, lease)
+            continue
+
+        if shardStatus(queue_dir)["done"] >= shard_count:
+            return simulated
+
+        if len(reclaimShards(queue_dir, lease)) == 0:
+            time.sleep(poll)
+
+def waitForShards(queue_dir: str, timeout: float = None, poll: float = 1) -> None:
+    '''Waits for every shard to be done, raising TimeoutError after timeout seconds.'''
+    shard_count = _readJson(os.path.join(queue_dir, "job.json"))["shard_count"]
+    deadline = None if timeout is None else time.time() + timeout
+
+    while shardStatus(queue_dir)["done"] < shard_count:
+        if deadline is not None and time.time() >= deadline:
+            raise TimeoutError("shards:waitForShards {} shards pending.".format(shard_count - shardStatus(queue_dir)["done"]))
+        time.sleep(poll)
+
+def _mergeShards(queue_dir: str) -> tuple:
+    shard_count = _readJson(os.path.join(queue_dir, "job.json"))["shard_count"]
+    status = shardStatus(queue_dir)
+
+    if status["done"] < shard_count:
+        raise ValueError("shards:mergeShards {} of {} shards are not done.".format(shard_count - status["done"], shard_count))
+
+    path_keys = set(_readJson(os.path.join(queue_dir, "done", _shardName(0)))["path_keys"])
+    shards = [np.load(os.path.join(queue_dir, "records", _shardName(index).replace(".json", ".npz")), allow_pickle=False)
+        for index in range(shard_count)]
+
+    try:
+        records = {key: np.concatenate([shard[key] for shard in shards], axis=-1) if key in path_keys else shards[0][key]
+            for key in shards[0].files}
+    finally:
+        for shard in shards:
+            shard.close()
+
+    return records, path_keys
+
+def mergeShards(queue_dir: str) -> Dict[str, np.ndarray]:
+    '''Merges the shards' records along the paths' axis.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        The records of every profile, keyed by "profile/category", as returned by runner.runSimulation.
+    '''
+    return _mergeShards(queue_dir)[0]
+
+def mergeMonitors(queue_dir: str) -> Dict[str, BaselSimulationMonitor]:
+    '''Merges the shards' path records onto a monitor per profile.
+
+    The merged monitors hold every path record as a plain record, derived ones included, so they support
+    the monitors' queries (e.g. quantiles, weighted_rate) without their profiles.
+    '''
+    config = _readJson(os.path.join(queue_dir, "job.json"))
+    records, path_keys = _mergeShards(queue_dir)
+    categories = dict(BaselSimulationMonitor.BaselRecordCategory.__members__, **SimulationMonitorBase.RecordBaseCategory.__members__)
+    monitors = {}
+
+    for profile_name in config.get("profiles", {}):
+        monitor = BaselSimulationMonitor({
+            "default_records": {"record_shape": (1, )},
+            "basel_records": {"record_shape": (0, 0), "daily_disclosure_record_shape": (0, 0)}})
+
+        prefix = profile_name + "/"
+        monitor.installRecords({categories[key[len(prefix):]]: records[key] for key in path_keys if key.startswith(prefix)})
+        monitors[profile_name] = monitor
+
+    return monitors
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Runs simulations distributed over a shared filesystem queue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="splits a JSON simulation configuration onto shards")
+    submit.add_argument("config", help="the JSON simulation configuration")
+    submit.add_argument("queue", help="the queue directory")
+    submit.add_argument("--shard-paths", type=int, required=True, help="the number of paths per shard")
+
+    worker = commands.add_parser("worker", help="simulates shards until every shard is done")
+    worker.add_argument("queue", help="the queue directory")
+    worker.add_argument("--lease", type=float, default=60, help="the seconds after which untouched claims are reclaimed")
+    worker.add_argument("--wait", type=float, default=0, help="the seconds to wait for a job to be submitted")
+
+    merge = commands.add_parser("merge", help="waits for every shard and merges their records")
+    merge.add_argument("queue", help="the queue directory")
+    merge.add_argument("-o", "--output", required=True, help="writes the records to the specified .npz file")
+    merge.add_argument("--timeout", type=float, default=None, help="the seconds to wait for the shards")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "submit":
+        with open(args.config, "r") as config_file:
+            config = json.load(config_file)
+
+        base_dir = os.path.dirname(os.path.abspath(args.config))
+        policies = loadPolicies(config, base_dir)
+        print("{} shards".format(submitShards(args.queue, config, policies, args.shard_paths, base_dir)))
+    elif args.command == "worker":
+        print("{} shards simulated".format(runWorker(args.queue, lease=args.lease, wait=args.wait)))
+    else:
+        waitForShards(args.queue, args.timeout)
+        np.savez(args.output, **mergeShards(args.queue))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
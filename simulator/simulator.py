@@ -1,6 +1,10 @@
 from typing import Callable, Dict, Type
 
+from concurrent.futures import ThreadPoolExecutor
+
+import copy
 import logging
+import os
 
 import numpy as np
 
@@ -9,6 +13,9 @@ from scipy.stats.distributions import norm
 from simulator.distribution.distribution_base import SimulationDistributionBase
 from simulator.monitor.monitor_base import SimulationMonitorBase
 from simulator.profile.profile_base import SimulationProfileBase
+from simulator.returns.returns_historical import HistoricalReturnSource
+from simulator.snapshot import SimulationSnapshot
+from simulator.streams import PathRandomStreams
 from utils.utils_decorators import inputDecorators
 
 logging.basicConfig(format='%(asctime)s-%(process)d-%(levelname)s-%(messages)s', level=logging.INFO)
@@ -26,8 +33,15 @@ class MonteCarloSimulator(object):
     # Given it is mutable, modifying on the class is the same as modifying on the instance.
     variables_schema = {
         "_trading_days_order" : ["A", "D"],
+        "_thread_block" : ["day", "year"],
     }
 
+    # Estimated per path footprint of the simulator's daily temporaries (returns and importance sampling weights)
+    SIMULATOR_PATH_BYTES = 6 * 8
+
+    # Default number of paths per random stream block, see PathRandomStreams
+    STREAM_BLOCK_PATHS = 4096
+
     def __init__(self, config = {}):
         # Simulator Configuration
         self._simulations_number = config.get("simulation_number", 3000)
@@ -40,13 +54,83 @@ class MonteCarloSimulator(object):
         self._ret_dist_mean = return_dist_config.get("mean", 0)
         self._ret_dist_std = return_dist_config.get("std", 1)
 
+        # Importance sampling: returns are drawn from N(mean + shift, std * scale) and each path carries
+        # the likelihood ratio of the target over the proposal distribution.
+        # Note: profiles' bankruptcy tests compare the MRC against positive returns (BaselSimulationProfile),
+        # hence a positive shift and/or a scale above 1 favours bankruptcies.
+        importance_sampling_config = config.get("importance_sampling", None)
+        self._importance_sampling: bool = importance_sampling_config is not None
+
+        if self._importance_sampling:
+            self._is_shift = importance_sampling_config.get("shift", 0)
+            self._is_scale = importance_sampling_config.get("scale", 1)
+
+            if not self._is_scale > 0:
+                raise ValueError(self.__class__.__name__, ":__init__ Invalid importance sampling scale {}.".format(self._is_scale))
+
+        # Historical returns: the daily returns are bootstrapped out of a returns file instead of
+        # being drawn from the returns distribution, see HistoricalReturnSource
+        returns_source_config = config.get("returns_source", None)
+        self._returns_source: HistoricalReturnSource = None
+        self._returns_source_state: dict = None
+
+        if returns_source_config is not None:
+            if self._importance_sampling:
+                raise ValueError(self.__class__.__name__, ":__init__ Importance sampling requires a parametric returns distribution.")
+
+            self._returns_source = HistoricalReturnSource(returns_source_config)
+
+        # Memory budget (bytes): paths are processed in sequential chunks fitting it.
+        # Chunk records are merged in memory, or streamed onto .npy files in chunk_directory.
+        self._memory_budget: int = config.get("memory_budget", None)
+        self._chunk_directory: str = config.get("chunk_directory", None)
+
+        # Random streams: the returns are drawn from a random stream per block of stream_block_paths paths,
+        # seeded off np.random, so that chunks and path ranges only draw their own paths' returns (see
+        # PathRandomStreams). Always the case under a memory budget and for path ranges, whose records then
+        # depend on the block size only, and neither on the budget nor on the range.
+        self._stream_block_paths: int = config.get("stream_block_paths", None)
+        self._streams: PathRandomStreams = None
+
+        # Profiles are stepped concurrently on profile_threads threads, by day or by year (thread_block)
+        self._profile_threads: int = config.get("profile_threads", None)
+        self._thread_block: str = config.get("thread_block", "day")
+        self._executor: ThreadPoolExecutor = None
+
         # Holds simulation profiles
         self._simulation_profiles: Dict[str, SimulationProfileBase] = {}
 
+        # Notified with the simulated and total path-years, after every simulated year
+        self._progress_callback: Callable[[int, int], None] = None
+        self._progress: int = 0
+
+        # The next year to simulate, set by partial simulations (see startSimulation's stop_year) and snapshots
+        self._next_year: int = 0
+        # The paths' importance sampling log weights, cumulated over the simulated years
+        self._log_weights: np.ndarray = None
+
         # Simulator status
         self._is_running: bool = False
 
-    def startSimulation(self) -> bool:
+    def startSimulation(self, paths: slice = None, stop_year: int = None) -> bool:
+        '''Runs the simulation, resuming it from the next year to simulate.
+
+        Parameters
+        ----------
+        paths : slice, optional
+            Simulates the specified range of paths only, e.g. a shard of a distributed simulation,
+            by default every path. The range's paths draw from their own random streams (see
+            stream_block_paths), so they are simulated as in a simulation of every path drawing from the
+            same streams, and the monitors' records span the range's paths.
+        stop_year : int, optional
+            Pauses the simulation before the specified year, e.g. to snapshot it, by default the
+            simulation runs to its end. Paused simulations resume on the following call.
+
+        Returns
+        -------
+        bool
+            Whether the simulation ran.
+        '''
         if self.is_running():
             logging.info(self.__class__.__name__, ":startSimulation already in progress.")
             return False
@@ -60,20 +144,327 @@ class MonteCarloSimulator(object):
         days_range: range = range(0, (self._num_trading_days), 1) if self._trading_days_order == "A" \
             else range(self._num_trading_days -1, -1, -1)
 
-        for sim_num in range(self.simulations_number):
-            logging.debug(self.__class__.__name__, 'Starting simulation {}'.format(sim_num))
+        paths = slice(0, self._num_years_per_sim) if paths is None else slice(*paths.indices(self._num_years_per_sim)[:2])
+        width: int = paths.stop - paths.start
+
+        if not width > 0:
+            raise ValueError(self.__class__.__name__, ":startSimulation Empty path range {}.".format(paths))
 
-            for day in days_range:
-                daily_return = norm.ppf(np.random.rand(self._num_years_per_sim), self._ret_dist_mean, self._ret_dist_std)
-                done = day == days_range[-1]
+        chunk_paths: int = self._chunkPaths(width)
+        stop_year = self.simulations_number if stop_year is None else stop_year
 
-                for profile_name, profile in self._simulation_profiles.items():
-                    logging.debug(self.__class__.__name__, ": Simulating profile {}".format(profile_name))
+        if not self._next_year < stop_year <= self.simulations_number:
+            raise ValueError(self.__class__.__name__, ":startSimulation Invalid stop year {}, resuming from year {}.".format(
+                stop_year, self._next_year))
 
-                    profile.performTransition(daily_return, (sim_num, day, done))
+        if (self._next_year > 0 or stop_year < self.simulations_number) and chunk_paths < self._num_years_per_sim:
+            raise ValueError(self.__class__.__name__, ":startSimulation Paused simulations must span every path in a single chunk.")
+
+        if self._next_year == 0:
+            self._progress = 0
+            self._streams = None
+
+            if self._stream_block_paths is not None or self._memory_budget is not None or width < self._num_years_per_sim:
+                self._streams = PathRandomStreams(int(np.random.randint(1 << 32)), self._streamBlockPaths())
+
+        # profiles only share the read-only daily returns, so they can be stepped concurrently
+        if self._profile_threads and len(self._simulation_profiles) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=min(self._profile_threads, len(self._simulation_profiles)))
+
+        try:
+            if chunk_paths < width:
+                self._simulateChunked(days_range, chunk_paths, paths)
+            else:
+                if width < self._num_years_per_sim:
+                    for profile in self._simulation_profiles.values():
+                        profile.monitor.configurePaths(width, paths.start)
+
+                self._simulate(days_range, paths, stop_year)
+
+            self._next_year = stop_year if stop_year < self.simulations_number else 0
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
 
         return True
 
+    def _simulate(self, days_range: range, paths: slice, stop_year: int = None) -> None:
+        '''Simulates the specified range of paths, drawing the same returns as a simulation of every path would.'''
+        width: int = paths.stop - paths.start
+        start_year: int = self._next_year
+        stop_year = self.simulations_number if stop_year is None else stop_year
+
+        if start_year == 0:
+            # every chunk's paths restart the bootstrap's blocks and their random streams
+            self._returns_source_state = None
+            self._log_weights = None
+
+            if self._streams is not None:
+                self._streams.select(paths)
+
+            if self._importance_sampling:
+                self._log_weights = np.zeros(width)
+
+                for profile in self._simulation_profiles.values():
+                    profile.monitor.allocateRecord(SimulationMonitorBase.RecordBaseCategory.LOG_LIKELIHOOD_RATIO,
+                        (self.simulations_number, width), fill_value=0.0, path_record=True)
+
+        log_weights: np.ndarray = self._log_weights
+
+        profiles = list(self._simulation_profiles.items())
+        year_blocks: bool = self._executor is not None and self._thread_block == "year"
+
+        for sim_num in range(start_year, stop_year):
+            logging.debug(self.__class__.__name__, 'Starting simulation {}'.format(sim_num))
+
+            # historical returns are bootstrapped a whole year at a time
+            sampled_returns: np.ndarray = None if self._returns_source is None else self._sampleYearlyReturns(paths, len(days_range))
+
+            if year_blocks:
+                # the year's returns are drawn upfront, in the same order as the daily draws
+                yearly_returns: np.ndarray = sampled_returns
+
+                if yearly_returns is None:
+                    yearly_returns = np.empty((len(days_range), width))
+
+                    for day_index in range(len(days_range)):
+                        yearly_returns[day_index] = self._drawDailyReturn(paths, log_weights)
+
+                self._runConcurrently([(self._simulateProfileYear, profile, yearly_returns, sim_num, days_range)
+                    for _, profile in profiles])
+            else:
+                for day_index, day in enumerate(days_range):
+                    done = day == days_range[-1]
+                    daily_return = self._drawDailyReturn(paths, log_weights) if sampled_returns is None else sampled_returns[day_index]
+
+                    if self._executor is None:
+                        for profile_name, profile in profiles:
+                            logging.debug(self.__class__.__name__, ": Simulating profile {}".format(profile_name))
+
+                            profile.performTransition(daily_return, (sim_num, day, done))
+                    else:
+                        self._runConcurrently([(profile.performTransition, daily_return, (sim_num, day, done))
+                            for _, profile in profiles])
+
+            if self._importance_sampling:
+                for _, profile in profiles:
+                    # a year's records depend on every return drawn so far, and so does its weight, kept
+                    # as a log so that it doesn't overflow (see SimulationMonitorBase.normalizedWeights)
+                    profile.monitor.addRecord(SimulationMonitorBase.RecordBaseCategory.LOG_LIKELIHOOD_RATIO, log_weights, sim_num)
+
+            self._progress += width
+
+            if self._progress_callback is not None:
+                self._progress_callback(self._progress, self.simulations_number * self._num_years_per_sim)
+
+    def _drawDailyReturn(self, paths: slice, log_weights: np.ndarray = None) -> np.ndarray:
+        '''Draws a day's returns for the specified paths, cumulating the importance sampling log weights.'''
+        uniform_draws: np.ndarray = np.random.rand(self._num_years_per_sim) if self._streams is None else self._streams.random()
+
+        if not self._importance_sampling:
+            return norm.ppf(uniform_draws, self._ret_dist_mean, self._ret_dist_std)
+
+        daily_return = norm.ppf(uniform_draws, self._ret_dist_mean + self._is_shift, self._ret_dist_std * self._is_scale)
+        log_weights += self._logLikelihoodRatio(daily_return)
+
+        return daily_return
+
+    def _sampleYearlyReturns(self, paths: slice, days: int) -> np.ndarray:
+        '''Bootstraps a year's (days, paths) historical returns, per random stream block when drawing from streams.'''
+        if self._streams is None:
+            yearly_returns, self._returns_source_state = self._returns_source.sample(days, self._num_years_per_sim,
+                self._returns_source_state)
+
+            return yearly_returns
+
+        blocks = self._streams.blocks
+        states = self._returns_source_state or [None] * len(blocks)
+        yearly_returns: np.ndarray = np.empty((days, paths.stop - paths.start))
+
+        for index, (_, generator, block_paths, selected_paths) in enumerate(blocks):
+            yearly_returns[:, selected_paths], states[index] = self._returns_source.sample(days, self._streams.block_paths,
+                states[index], block_paths, generator)
+
+        self._returns_source_state = states
+
+        return yearly_returns
+
+    def _runConcurrently(self, tasks: list) -> None:
+        '''Runs the (function, *args) tasks on the executor, returning once all of them are done.'''
+        futures = [self._executor.submit(*task) for task in tasks]
+
+        # barrier, re-raising the first failure
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def _simulateProfileYear(profile: SimulationProfileBase, yearly_returns: np.ndarray, sim_num: int, days_range: range) -> None:
+        for day_index, day in enumerate(days_range):
+            profile.performTransition(yearly_returns[day_index], (sim_num, day, day == days_range[-1]))
+
+    def _simulateChunked(self, days_range: range, chunk_paths: int, simulated_paths: slice) -> None:
+        '''Simulates the paths in sequential chunks, merging the chunks' records onto full-width records.
+
+        Each chunk only draws from its own paths' random streams, so the merged records are identical
+        to those of a single-chunk simulation drawing from the same streams. Records streamed onto
+        chunk_directory are only mapped while a chunk is written onto them, so that their pages don't
+        pile up in the process' resident memory.
+        '''
+        merged_records: Dict[str, Dict] = None
+
+        for start in range(simulated_paths.start, simulated_paths.stop, chunk_paths):
+            paths = slice(start, min(start + chunk_paths, simulated_paths.stop))
+            logging.debug(self.__class__.__name__, ": Simulating paths {} to {}".format(paths.start, paths.stop))
+
+            for profile in self._simulation_profiles.values():
+                profile.monitor.configurePaths(paths.stop - paths.start, paths.start)
+
+            self._simulate(days_range, paths)
+
+            if merged_records is None:
+                merged_records = {profile_name: self._allocateMergedRecords(profile_name, profile.monitor,
+                    simulated_paths.stop - simulated_paths.start) for profile_name, profile in self._simulation_profiles.items()}
+
+            merged_paths = slice(paths.start - simulated_paths.start, paths.stop - simulated_paths.start)
+
+            for profile_name, profile in self._simulation_profiles.items():
+                for category_key, record in profile.monitor.pathRecords().items():
+                    merged_record = merged_records[profile_name][category_key]
+
+                    if isinstance(merged_record, str):
+                        merged_record = np.load(merged_record, mmap_mode="r+")
+
+                    merged_record[..., merged_paths] = record
+
+                    if isinstance(merged_record, np.memmap):
+                        merged_record.flush()
+
+                    del merged_record
+
+        for profile_name, profile in self._simulation_profiles.items():
+            profile.monitor.installRecords({category_key: np.load(record, mmap_mode="r+") if isinstance(record, str) else record
+                for category_key, record in merged_records[profile_name].items()}, simulated_paths.start)
+
+    def _allocateMergedRecords(self, profile_name: str, monitor: SimulationMonitorBase, paths: int) -> Dict:
+        '''Allocates the full-width records, in memory or as (sparse) .npy files whose paths are returned instead.'''
+        merged_records = {}
+
+        for category_key, record in monitor.pathRecords().items():
+            shape = record.shape[:-1] + (paths, )
+
+            if self._chunk_directory is None:
+                merged_records[category_key] = np.empty(shape, dtype=record.dtype)
+            else:
+                os.makedirs(self._chunk_directory, exist_ok=True)
+                file_name = "{}_{}.npy".format(profile_name, getattr(category_key, "name", category_key))
+                record_path = os.path.join(self._chunk_directory, file_name)
+                # only writes the header, the file's data is left sparse
+                np.lib.format.open_memmap(record_path, mode="w+", dtype=record.dtype, shape=shape).flush()
+                merged_records[category_key] = record_path
+
+        return merged_records
+
+    def _chunkPaths(self, simulated_paths: int = None) -> int:
+        '''Estimates the number of paths that can be simulated at once within the memory budget.'''
+        total_paths: int = self._num_years_per_sim
+        simulated_paths = total_paths if simulated_paths is None else simulated_paths
+
+        if self._memory_budget is None:
+            return simulated_paths
+
+        profiles_path_bytes: int = sum(profile.pathBytes() for profile in self._simulation_profiles.values())
+        records_path_bytes: int = sum(profile.monitor.pathBytes() for profile in self._simulation_profiles.values())
+        block_paths: int = self._streamBlockPaths()
+
+        # a random stream block partially spanned by a chunk is drawn in full
+        budget: int = self._memory_budget - 8 * block_paths
+
+        # merged records are kept in memory unless streamed to disk
+        if self._chunk_directory is None:
+            budget -= records_path_bytes * simulated_paths
+
+        chunk_paths: int = budget // (profiles_path_bytes + MonteCarloSimulator.SIMULATOR_PATH_BYTES)
+
+        if chunk_paths < 1:
+            raise ValueError(self.__class__.__name__, ":_chunkPaths Memory budget {} too small{}.".format(self._memory_budget,
+                "" if self._chunk_directory else ", consider streaming the records onto a chunk_directory"))
+
+        # chunks spanning whole blocks draw their random streams straight onto the returns
+        if chunk_paths < simulated_paths and chunk_paths > block_paths:
+            chunk_paths -= chunk_paths % block_paths
+
+        return min(simulated_paths, chunk_paths)
+
+    def _streamBlockPaths(self) -> int:
+        return MonteCarloSimulator.STREAM_BLOCK_PATHS if self._stream_block_paths is None else self._stream_block_paths
+
+    def snapshot(self, directory: str = None) -> SimulationSnapshot:
+        '''Snapshots a paused simulation (see startSimulation's stop_year), so that scenarios can be forked from it.
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory the records are saved onto, by default a temporary directory removed by the snapshot's close.
+
+        Returns
+        -------
+        SimulationSnapshot
+            The simulator's, profiles' and monitors' state.
+        '''
+        if self._next_year == 0:
+            raise ValueError(self.__class__.__name__, ":snapshot Only paused simulations can be snapshot.")
+
+        snapshot = SimulationSnapshot(self._next_year, directory)
+        snapshot.simulator_state = {
+            "rng_state": np.random.get_state(),
+            "progress": self._progress,
+            "log_weights": None if self._log_weights is None else self._log_weights.copy(),
+            "streams": None if self._streams is None else self._streams.state,
+            "returns_source_state": copy.deepcopy(self._returns_source_state)}
+
+        for profile_name, profile in self._simulation_profiles.items():
+            snapshot.saveProfile(profile_name, profile)
+
+        return snapshot
+
+    def restoreSnapshot(self, snapshot: SimulationSnapshot) -> None:
+        '''Restores a snapshot onto the simulator's profiles, resuming the simulation from the snapshot's year.
+
+        The simulator may be configured differently (e.g. another returns distribution), and so may its
+        profiles (e.g. another max_report_value or policy), as long as the profiles' names and records'
+        shapes match those of the snapshot. The records share their snapshot pages until written (copy-on-write),
+        so every scenario forked from a snapshot only computes, and copies, its own years.
+        '''
+        if self.is_running():
+            raise ValueError(self.__class__.__name__, ":restoreSnapshot Simulation in progress.")
+
+        if self._importance_sampling != (snapshot.simulator_state["log_weights"] is not None):
+            raise ValueError(self.__class__.__name__, ":restoreSnapshot Importance sampling must match the snapshot's.")
+
+        for profile_name, profile in self._simulation_profiles.items():
+            snapshot.restoreProfile(profile_name, profile)
+
+        simulator_state = snapshot.simulator_state
+        np.random.set_state(simulator_state["rng_state"])
+
+        self._next_year = snapshot.year
+        self._progress = simulator_state["progress"]
+        self._log_weights = None if simulator_state["log_weights"] is None else simulator_state["log_weights"].copy()
+        self._returns_source_state = copy.deepcopy(simulator_state["returns_source_state"])
+        self._streams = None
+
+        if simulator_state["streams"] is not None:
+            self._streams = PathRandomStreams(simulator_state["streams"]["entropy"], simulator_state["streams"]["block_paths"])
+            self._streams.setState(simulator_state["streams"])
+
+    def _logLikelihoodRatio(self, daily_return: np.ndarray) -> np.ndarray:
+        '''Log of the target over the proposal (importance sampling) density, for each path's daily return.'''
+        target_z = (daily_return - self._ret_dist_mean) / self._ret_dist_std
+        proposal_z = (daily_return - self._ret_dist_mean - self._is_shift) / (self._ret_dist_std * self._is_scale)
+
+        return 0.5 * (proposal_z * proposal_z - target_z * target_z) + np.log(self._is_scale)
+
     def addSimulationProfile(self, name: str, sim_profile: Type[SimulationProfileBase]) -> bool:
         if not issubclass(sim_profile.__class__, SimulationProfileBase):
             logging.error(self.__class__.__name__, ":addSimulationProfile Invalid profile class {} . ".format(sim_profile.__name__))
@@ -86,7 +477,7 @@ class MonteCarloSimulator(object):
     def removeSimulationProfile(self, profile_name :str) -> Type[SimulationProfileBase]:
         return self._simulation_profiles.pop(profile_name, None)
     
-    def createAndAddSimulationProfile(self, name:str, profile_class: Type[SimulationProfileBase], sim_dist: Type[SimulationDistributionBase], monitor: Type[SimulationMonitorBase]) -> Type[SimulationProfileBase]:
+    def createAndAddSimulationProfile(self, name:str, profile_class: Type[SimulationProfileBase], sim_dist: Type[SimulationDistributionBase], monitor: Type[SimulationMonitorBase], config: dict = {}) -> Type[SimulationProfileBase]:
         '''
         Creates a new profile and adds it to the MonteCarloSimulator instance stack.
         
@@ -100,6 +491,8 @@ class MonteCarloSimulator(object):
             The underlying distribution function.
         monitor : SimulationMonitorBase, optional
             A monitor object derived from SimulatorMonitorBase.
+        config : dict, optional
+            Configuration passed on to the profile's constructor.
         
         Returns
         -------
@@ -114,7 +507,7 @@ class MonteCarloSimulator(object):
             logging.error(self.__class__.__name__, ":addSimulationProfile Invalid distribution class {} . ".format(sim_dist.__name__))
 
         if not self._simulation_profiles.get(name):
-            self._simulation_profiles[name] = profile_class(sim_dist, monitor)
+            self._simulation_profiles[name] = profile_class(sim_dist, monitor, config)
             return self._simulation_profiles[name]
         else:
             logging.error(self.__class__.__name__, ":addSimulationProfile Duplicate simulation profile {} . ".format(name))
@@ -167,5 +560,29 @@ class MonteCarloSimulator(object):
 
         self._simulations_number = amount
 
+    @property
+    def progress_callback(self) -> Callable[[int, int], None]:
+        return self._progress_callback
+
+    @progress_callback.setter
+    def progress_callback(self, callback: Callable[[int, int], None]) -> None:
+        '''
+        [Sets the function notified of the simulation's progress]
+
+        The callback receives the number of simulated path-years and the simulation's total
+        number of path-years, after every simulated year (of every chunk).
+
+        Parameters
+        ----------
+        callback : Callable[[int, int], None]
+            The progress callback, None to disable progress notifications.
+
+        Returns
+        -------
+        None
+        '''
+
+        self._progress_callback = callback
+
     def is_running(self) -> bool:
         return self._is_running
\ No newline at end of file
@@ -0,0 +1,87 @@
+from typing import Dict
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+class SimulationSnapshot(object):
+    '''The state of a paused simulation, see MonteCarloSimulator.snapshot.
+
+    The profiles' records are saved as .npy files and restored as copy-on-write memory maps: every
+    simulation restored from the snapshot shares the records' pages until it writes onto them.
+
+    Parameters
+    ----------
+    year : int
+        The year the simulation resumes from.
+    directory : str, optional
+        The directory the records are saved onto, by default a temporary directory removed by close.
+    '''
+
+    def __init__(self, year: int, directory: str = None):
+        self._year: int = year
+        self._owns_directory: bool = directory is None
+        self._directory: str = tempfile.mkdtemp(prefix="basel-snapshot-") if directory is None else directory
+        # profile name -> category -> record file
+        self._record_files: Dict[str, Dict] = {}
+        # profile name -> profile state, see SimulationProfileBase.snapshotState
+        self._profile_states: Dict[str, dict] = {}
+        self.simulator_state: dict = None
+
+        os.makedirs(self._directory, exist_ok=True)
+
+    def saveProfile(self, profile_name: str, profile) -> None:
+        '''Saves the profile's state along with its monitor's records.'''
+        record_files = self._record_files[profile_name] = {}
+
+        for category_key, record in profile.monitor.record().items():
+            if not isinstance(record, np.ndarray):
+                continue
+
+            record_file = os.path.join(self._directory, "{}_{}.npy".format(profile_name, getattr(category_key, "name", category_key)))
+            np.save(record_file, record, allow_pickle=False)
+            record_files[category_key] = record_file
+
+        self._profile_states[profile_name] = profile.snapshotState()
+
+    def restoreProfile(self, profile_name: str, profile) -> None:
+        '''Restores the profile's state, its monitor's records being copy-on-write maps of the saved ones.'''
+        if not profile_name in self._record_files:
+            raise ValueError(self.__class__.__name__, ":restoreProfile Unknown profile {}.".format(profile_name))
+
+        monitor = profile.monitor
+        records = {}
+
+        for category_key, record_file in self._record_files[profile_name].items():
+            record = np.load(record_file, mmap_mode="c", allow_pickle=False)
+            current = monitor.record().get(category_key, None)
+
+            if isinstance(current, np.ndarray) and (current.shape != record.shape or current.dtype != record.dtype):
+                raise ValueError(self.__class__.__name__, ":restoreProfile Mismatching {} record for profile {}.".format(
+                    getattr(category_key, "name", category_key), profile_name))
+
+            records[category_key] = record
+
+        monitor.restoreRecords(records)
+        profile.restoreState(self._profile_states[profile_name])
+
+    def close(self) -> None:
+        '''Removes the snapshot's temporary directory, if it created one.'''
+        if self._owns_directory and os.path.isdir(self._directory):
+            shutil.rmtree(self._directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def year(self) -> int:
+        return self._year
+
+    @property
+    def directory(self) -> str:
+        return self._directory
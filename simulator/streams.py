@@ -0,0 +1,86 @@
+from typing import List, Tuple
+
+import numpy as np
+
+class PathRandomStreams(object):
+    '''Independent random streams per block of paths.
+
+    Paths are split onto blocks of block_paths paths, block b drawing from its own generator, seeded with
+    SeedSequence(entropy, spawn_key=(b, )) as SeedSequence(entropy).spawn would. A range of paths (e.g. a
+    chunk or a shard) thus only runs its own blocks' generators, and draws the same numbers for its paths
+    as a simulation of every path would, whatever the range.
+
+    Parameters
+    ----------
+    entropy : int
+        The streams' root entropy.
+    block_paths : int
+        The number of paths per block.
+    '''
+
+    def __init__(self, entropy: int, block_paths: int):
+        if not block_paths > 0:
+            raise ValueError(self.__class__.__name__, ":__init__ Invalid number of paths per block {}.".format(block_paths))
+
+        self._entropy: int = entropy
+        self._block_paths: int = block_paths
+        self._paths: slice = None
+        # (block, generator, the block's slice of paths drawn, the paths' slice of the selection)
+        self._blocks: List[Tuple[int, np.random.Generator, slice, slice]] = []
+
+    def select(self, paths: slice) -> None:
+        '''Starts the streams of the blocks spanned by the range of paths, from their beginning.'''
+        self._paths = paths
+        self._blocks = []
+
+        for block in range(paths.start // self._block_paths, (paths.stop - 1) // self._block_paths + 1):
+            block_start = block * self._block_paths
+            start = max(paths.start, block_start)
+            stop = min(paths.stop, block_start + self._block_paths)
+
+            generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(self._entropy, spawn_key=(block, ))))
+            self._blocks.append((block, generator, slice(start - block_start, stop - block_start),
+                slice(start - paths.start, stop - paths.start)))
+
+    def random(self, days: int = None) -> np.ndarray:
+        '''Draws uniform numbers for the selected paths, a (paths, ) day or a (days, paths) block of days.
+
+        Every block's generator draws for the whole block, so ranges not aligned on blocks discard the
+        draws of the paths they don't span.
+        '''
+        leading = () if days is None else (days, )
+        uniform_draws = np.empty(leading + (self._paths.stop - self._paths.start, ))
+
+        for _, generator, block_paths, selected_paths in self._blocks:
+            draws = uniform_draws[..., selected_paths]
+
+            if block_paths.stop - block_paths.start == self._block_paths and draws.flags.c_contiguous:
+                generator.random(out=draws)
+            else:
+                uniform_draws[..., selected_paths] = generator.random(leading + (self._block_paths, ))[..., block_paths]
+
+        return uniform_draws
+
+    @property
+    def blocks(self) -> List[Tuple[int, np.random.Generator, slice, slice]]:
+        '''The selected blocks, as (block, generator, the block's slice of paths drawn, the paths' slice of the selection).'''
+        return self._blocks
+
+    @property
+    def block_paths(self) -> int:
+        return self._block_paths
+
+    @property
+    def state(self) -> dict:
+        '''The selected streams' state, see setState.'''
+        return {"entropy": self._entropy, "block_paths": self._block_paths, "paths": (self._paths.start, self._paths.stop),
+            "generators": [generator.bit_generator.state for _, generator, _, _ in self._blocks]}
+
+    def setState(self, state: dict) -> None:
+        '''Restores the selected streams' state, returned by state.'''
+        self._entropy = state["entropy"]
+        self._block_paths = state["block_paths"]
+        self.select(slice(*state["paths"]))
+
+        for (_, generator, _, _), generator_state in zip(self._blocks, state["generators"]):
+            generator.bit_generator.state = generator_state
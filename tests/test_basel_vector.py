@@ -0,0 +1,74 @@
+import unittest
+
+from basel_gym.basel_base import PseudoRandomNumberQueue
+from basel_gym.basel_simple import BaselSimple
+from basel_gym.basel_vector import BaselVectorEnv
+import numpy as np
+
+
+def createEnvs(env_indices: range, seed: int, random_queue_size: int) -> list:
+    '''Sequential counterpart of a BaselVectorEnv worker.'''
+    np.random.seed(seed + env_indices.start)
+    random_queue = PseudoRandomNumberQueue(random_queue_size)
+    random_queue.repopulate()
+    envs = []
+
+    for env_index in env_indices:
+        env = BaselSimple({})
+        env._rndGenerator = random_queue
+        env.seed(seed + env_index)
+        envs.append(env)
+
+    return envs
+
+
+class CheckedBaselSimple(BaselSimple):
+    def step(self, action):
+        if not self.action_space.contains(action):
+            raise ValueError("CheckedBaselSimple:step Invalid action.")
+
+        return super().step(action)
+
+
+class TestBaselVectorEnv(unittest.TestCase):
+    def test_matches_sequential_envs(self):
+        config = {"num_envs": 6, "workers": 2, "seed": 7, "random_queue_size": 5000}
+        envs = createEnvs(range(0, 3), 7, 5000) + createEnvs(range(3, 6), 7, 5000)
+        actions = np.random.RandomState(1).randint(0, 3000, (300, 6))
+
+        with BaselVectorEnv(config) as vector_env:
+            observations = vector_env.reset()
+            np.testing.assert_array_equal(observations, [env.reset() for env in envs])
+
+            ended = 0
+
+            for step_actions in actions:
+                observations, rewards, dones, infos = vector_env.step(step_actions)
+                self.assertEqual(len(infos), 6)
+
+                for env_index, (env, action) in enumerate(zip(envs, step_actions)):
+                    observation, reward, done, _ = env.step(action)
+
+                    self.assertEqual(rewards[env_index], reward)
+                    self.assertEqual(dones[env_index], done)
+
+                    if done:
+                        ended += 1
+                        np.testing.assert_array_equal(vector_env.terminal_observations[env_index], observation)
+                        observation = env.reset()
+
+                    np.testing.assert_array_equal(observations[env_index], observation)
+
+            self.assertGreater(ended, 0)
+
+    def test_worker_error(self):
+        with BaselVectorEnv({"num_envs": 2, "workers": 1, "env_class": CheckedBaselSimple}) as vector_env:
+            vector_env.reset()
+
+            with self.assertRaises(RuntimeError):
+                vector_env.step([1, 5000])
+
+            vector_env.step([1, 2])
+
+        with self.assertRaises(ValueError):
+            vector_env.reset()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+import unittest
+
+from simulator.cache.cache_results import SimulationResultCache
+from simulator.runner import configDigest, resolvePaths
+import numpy as np
+
+
+class TestResultCache(unittest.TestCase):
+    def test_digest(self):
+        table = np.zeros((2, 3))
+
+        self.assertEqual(SimulationResultCache.digest({"a": 1, "b": 2}, {"p": table}),
+            SimulationResultCache.digest({"b": 2, "a": 1}, {"p": table.copy()}))
+        self.assertNotEqual(SimulationResultCache.digest({"a": 1}, {"p": table}),
+            SimulationResultCache.digest({"a": 1}, {"p": table + 1}))
+
+    def test_returns_file_digest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = resolvePaths({"returns_source": {"path": "returns.npy"}}, directory)
+            self.assertEqual(config["returns_source"]["path"], os.path.join(os.path.abspath(directory), "returns.npy"))
+
+            np.save(config["returns_source"]["path"], np.zeros(100))
+            digest = configDigest(config, {})
+
+            # rewriting the returns file at the same path changes the digest
+            np.save(config["returns_source"]["path"], np.ones(100))
+            self.assertNotEqual(configDigest(config, {}), digest)
+
+    def test_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            record = {"r": np.zeros(1000)}
+            entry_size = os.path.getsize(SimulationResultCache(directory).put("a", record))
+            cache = SimulationResultCache(directory, max_size=int(entry_size * 2.5))
+
+            os.utime(cache.path("a"), (time.time() - 20, time.time() - 20))
+            cache.put("b", record)
+            os.utime(cache.path("b"), (time.time() - 10, time.time() - 10))
+
+            # a hit makes "a" the most recently used entry
+            np.testing.assert_array_equal(cache.get("a")["r"], record["r"])
+            cache.put("c", record)
+
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("c"))
+            self.assertLessEqual(cache.size(), cache.max_size)
@@ -0,0 +1,75 @@
+import unittest
+
+from basel_gym.basel_base import PseudoRandomNumberQueue
+from basel_gym.basel_simple import BaselSimple
+from simulator.distribution.distribution_discrete import DiscreteSimulationDistribution
+from simulator.evaluation.evaluation_tabular import TabularPolicyEvaluator
+import numpy as np
+
+
+def sampleEpisodes(table: np.ndarray, episodes: int, seed: int = 0) -> tuple:
+    '''Monte Carlo estimates of the episode rewards, bankruptcies and last k_mul on BaselSimple.'''
+    np.random.seed(seed)
+    env = BaselSimple({})
+    env.seed(seed)
+    env._rndGenerator = PseudoRandomNumberQueue(100000)
+
+    rewards, bankruptcies, multipliers = np.zeros(episodes), np.zeros(episodes), np.zeros(episodes, dtype=int)
+
+    for episode in range(episodes):
+        observation, done = env.reset(), False
+
+        while not done:
+            action = table[observation[2], observation[1], 250 - observation[0]] / 0.001
+            observation, reward, done, _ = env.step(action)
+            rewards[episode] += reward
+
+        bankruptcies[episode] = env._is_bankrupt
+        multipliers[episode] = observation[2]
+
+    return rewards, bankruptcies, multipliers
+
+
+class TestTabularPolicyEvaluator(unittest.TestCase):
+    def test_matches_environment(self):
+        table = np.random.RandomState(3).uniform(1.0, 1.6, (8, 12, 250))
+        result = TabularPolicyEvaluator().evaluatePolicy(table)
+        rewards, bankruptcies, multipliers = sampleEpisodes(table, 2000)
+
+        self.assertAlmostEqual(result["multiplier_distribution"].sum(), 1)
+        self.assertAlmostEqual(result["exceedance_distribution"].sum(), 1)
+        self.assertLess(abs(result["expected_reward"] - rewards.mean()), 4 * rewards.std() / np.sqrt(len(rewards)))
+
+        bankruptcy_probability = result["bankruptcy_probability"]
+        self.assertLess(abs(bankruptcy_probability - bankruptcies.mean()), 4 * np.sqrt(bankruptcy_probability * (1 - bankruptcy_probability) / len(bankruptcies)))
+
+        sampled_multipliers = np.bincount(multipliers, minlength=8) / len(multipliers)
+        np.testing.assert_allclose(result["multiplier_distribution"], sampled_multipliers, atol=0.03)
+
+    def test_policy_stack(self):
+        tables = [np.random.RandomState(seed).uniform(0.2, 2, (8, 12, 250)) for seed in range(3)]
+        evaluator = TabularPolicyEvaluator()
+        results = evaluator.evaluatePolicy(DiscreteSimulationDistribution({"distribution_function": tables, "policy_stack": True}))
+
+        for policy, table in enumerate(tables):
+            result = evaluator.evaluatePolicy(DiscreteSimulationDistribution({"distribution_function": table}))
+
+            for key, value in result.items():
+                np.testing.assert_allclose(results[key][policy], value, err_msg=key)
+
+    def test_initial_distribution(self):
+        initial_distribution = np.zeros((251, 12, 8))
+        initial_distribution[1, 0, 2] = 1
+
+        # a single day left, with a policy that never goes bankrupt: the review resets k_mul to 0
+        result = TabularPolicyEvaluator({"initial_distribution": initial_distribution}).evaluatePolicy(np.full((8, 12, 250), 100.0))
+
+        self.assertAlmostEqual(result["bankruptcy_probability"], 0)
+        np.testing.assert_allclose(result["multiplier_distribution"], np.eye(8)[0])
+        self.assertAlmostEqual(result["expected_reward"], 0.00001 * 100 * 3 * TabularPolicyEvaluator()._normal_var10 - 0.01)
+
+        # no step is left on ttob 0
+        initial_distribution[1, 0, 2], initial_distribution[0, 0, 0] = 0, 1
+
+        with self.assertRaises(ValueError):
+            TabularPolicyEvaluator({"initial_distribution": initial_distribution})
@@ -0,0 +1,93 @@
+import unittest
+
+from simulator.monitor.monitor_basel import BaselSimulationMonitor
+import numpy as np
+
+
+def createMonitor(years: int = 3, paths: int = 4) -> BaselSimulationMonitor:
+    return BaselSimulationMonitor({
+        "default_records": {"record_shape": (1, )},
+        "basel_records": {"record_shape": (years, paths), "daily_disclosure_record_shape": (250, paths)}})
+
+
+class TestMonitor(unittest.TestCase):
+    def test_derived_record(self):
+        monitor = createMonitor()
+        categories = BaselSimulationMonitor.BaselRecordCategory
+        calls = []
+
+        def doubled(m):
+            calls.append(1)
+            return m.record(categories.MRC_ANNUAL) * 2
+
+        monitor.registerDerivedRecord(categories.RETURN_ANNUAL, doubled, dependencies=(categories.MRC_ANNUAL, ))
+
+        monitor.addRecord(categories.MRC_ANNUAL, np.arange(4), 0)
+        self.assertEqual(monitor.record(categories.RETURN_ANNUAL)[0].tolist(), [0, 2, 4, 6])
+        monitor.record(categories.RETURN_ANNUAL)
+        self.assertEqual(len(calls), 1)
+
+        # direct writes are only visible once flagged
+        monitor.record(categories.MRC_ANNUAL)[1] = 1
+        monitor.markModified(categories.MRC_ANNUAL)
+        self.assertEqual(monitor.record(categories.RETURN_ANNUAL)[1].tolist(), [2, 2, 2, 2])
+        self.assertEqual(len(calls), 2)
+
+    def test_action_code_overflow(self):
+        monitor = BaselSimulationMonitor({
+            "default_records": {"record_shape": (1, )},
+            "basel_records": {"record_shape": (3, 4), "daily_disclosure_record_shape": (250, 4), "compact": True}})
+
+        self.assertEqual(monitor.encodeActions(np.array([0.5, 65.535])).tolist(), [500, 65535])
+
+        # uint16 codes of 0.001 would wrap beyond 65.535
+        with self.assertRaises(ValueError):
+            monitor.encodeActions(np.array([0.5, 70.]), np.zeros(2, np.uint16))
+
+        with self.assertRaises(ValueError):
+            monitor.encodeActions(np.array([-0.001]))
+
+    def test_initial_multipliers(self):
+        rc_kmul_value = BaselSimulationMonitor.BaselRecordCategory.KMULTIPLIERS_VALUE
+        monitor = createMonitor()
+
+        # every year's multiplier is 3 until reviewed
+        self.assertTrue((monitor.record(rc_kmul_value) == 3).all())
+
+        monitor = BaselSimulationMonitor({
+            "default_records": {"record_shape": (1, )},
+            "basel_records": {"record_shape": (3, 4), "daily_disclosure_record_shape": (250, 4), "event_log": True}})
+
+        for year in range(2):
+            self.assertTrue((monitor.stateRow(rc_kmul_value, year) == 3).all())
+
+    def test_cached_queries(self):
+        monitor = createMonitor()
+        categories = BaselSimulationMonitor.BaselRecordCategory
+
+        monitor.addRecord(categories.BANKRUPTCY, np.array([0, 1, 0, 1]), 0)
+        rate = monitor.rate(categories.BANKRUPTCY)
+        self.assertEqual(rate.tolist(), [0.5, 0, 0, 0])
+        self.assertIs(monitor.rate(categories.BANKRUPTCY), rate)
+
+        monitor.addRecord(categories.BANKRUPTCY, np.array([1, 1, 1, 1]), 1)
+        self.assertEqual(monitor.rate(categories.BANKRUPTCY).tolist(), [0.5, 1, 0, 0])
+
+        monitor.addRecord(categories.MRC_ANNUAL, np.array([1., 2., 3., 4.]), 0)
+        self.assertEqual(monitor.mean_by_year(categories.MRC_ANNUAL).tolist(), [2.5, 0, 0])
+        self.assertEqual(monitor.quantiles(categories.MRC_ANNUAL, [0, 1]).tolist(), [[1, 0, 0], [4, 0, 0]])
+
+    def test_weighted_queries(self):
+        monitor = createMonitor(years=1, paths=4)
+        categories = BaselSimulationMonitor.BaselRecordCategory
+
+        monitor.addRecord(categories.BANKRUPTCY, np.array([0, 1, 0, 1]), 0)
+        estimate, stderr = monitor.weighted_rate(categories.BANKRUPTCY)
+        self.assertEqual(estimate.tolist(), [0.5, 0])
+
+        # weights are self-normalised, so that offsetting every log ratio leaves them unchanged
+        monitor.allocateRecord(BaselSimulationMonitor.RecordBaseCategory.LOG_LIKELIHOOD_RATIO, (1, 4))
+        monitor.addRecord(BaselSimulationMonitor.RecordBaseCategory.LOG_LIKELIHOOD_RATIO, np.log([2, 0.5, 1, 0.5]) + 1000, 0)
+        estimate, stderr = monitor.weighted_rate(categories.BANKRUPTCY)
+        self.assertAlmostEqual(estimate[0], 0.25)
+        self.assertAlmostEqual(stderr[0], np.std([0, 0.5, 0, 0.5], ddof=1) / 2)
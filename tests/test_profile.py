@@ -0,0 +1,144 @@
+import unittest
+
+from simulator.distribution.distribution_discrete import DiscreteSimulationDistribution
+from simulator.monitor.monitor_basel import BaselSimulationMonitor
+from simulator.monitor.monitor_events import SimulationEventType
+from simulator.profile.profile_basel import BaselSimulationProfile
+from simulator.profile.profile_basel_kernel import NUMBA_AVAILABLE
+import numpy as np
+
+
+def runProfile(config: dict, records_config: dict = {}, years: int = 2, paths: int = 64, seed: int = 7, policies: list = None,
+        policy_shape: tuple = (8, 12, 250)) -> BaselSimulationMonitor:
+    rnd = np.random.RandomState(seed)
+    table = rnd.uniform(0.05, 1.5, policy_shape)
+    returns = rnd.normal(0, 1, (years, 250, paths))
+
+    if policies is None:
+        dist = DiscreteSimulationDistribution({"distribution_function": table})
+    else:
+        dist = DiscreteSimulationDistribution({"distribution_function": [table * scale for scale in policies], "policy_stack": True})
+        records_config = dict(records_config, policy_count=len(policies))
+
+    monitor = BaselSimulationMonitor({
+        "default_records": {"record_shape": (1, )},
+        "basel_records": dict(records_config, record_shape=(years, paths), daily_disclosure_record_shape=(250, paths))})
+    profile = BaselSimulationProfile(dist, monitor, config)
+
+    for sim_num in range(years):
+        for day in range(249, -1, -1):
+            profile.performTransition(returns[sim_num, 249 - day], (sim_num, day, day == 0))
+
+    return monitor
+
+
+class TestProfile(unittest.TestCase):
+    def assertSameRecords(self, expected: BaselSimulationMonitor, actual: BaselSimulationMonitor):
+        for category in BaselSimulationMonitor.BaselRecordCategory:
+            np.testing.assert_array_equal(expected.record(category), actual.record(category), err_msg=category.name)
+
+    def test_workspace_transition(self):
+        self.assertSameRecords(runProfile({}), runProfile({"use_workspace": True}))
+
+    @unittest.skipUnless(NUMBA_AVAILABLE, "requires numba")
+    def test_kernel_transition(self):
+        self.assertSameRecords(runProfile({}), runProfile({"use_kernel": True}))
+
+    def test_policy_bounds(self):
+        # the in-place lookups raise as np.ravel_multi_index does on the NumPy path
+        configs = [{}, {"use_workspace": True}] + ([{"use_kernel": True}] if NUMBA_AVAILABLE else [])
+
+        for config in configs:
+            for policy_shape in ((8, 12, 200), (8, 5, 250), (3, 12, 250)):
+                with self.assertRaises(ValueError, msg=(config, policy_shape)):
+                    runProfile(config, years=6, policy_shape=policy_shape)
+
+    def test_compact_dtypes(self):
+        categories = BaselSimulationMonitor.BaselRecordCategory
+        records_config = {"compact": True, "dtypes": {"MRC_DAILY": "float32"}}
+        expected = runProfile({})
+        compact = runProfile({}, records_config)
+
+        self.assertEqual(compact.record(categories.EXCEEDENCES).dtype, np.int8)
+        self.assertEqual(compact.record(categories.ACTION).dtype, np.uint16)
+        self.assertEqual(compact.record(categories.MRC_DAILY).dtype, np.float32)
+
+        for category in (categories.EXCEEDENCES, categories.BANKRUPTCY, categories.KMULTIPLIERS_INDECES, categories.DISCLOSURE):
+            np.testing.assert_array_equal(expected.record(category), compact.record(category), err_msg=category.name)
+
+        np.testing.assert_allclose(compact.decodeActions(), expected.record(categories.ACTION), atol=0.0005)
+
+        self.assertSameRecords(compact, runProfile({"use_workspace": True}, records_config))
+
+        if NUMBA_AVAILABLE:
+            self.assertSameRecords(compact, runProfile({"use_kernel": True}, records_config))
+
+    def test_policy_stack(self):
+        scales = [1, 0.5, 1.2]
+        configs = [{}, {"use_workspace": True}] + ([{"use_kernel": True}] if NUMBA_AVAILABLE else [])
+
+        for config in configs:
+            stacked = runProfile(config, policies=scales)
+
+            for k, scale in enumerate(scales):
+                single = runProfile({}, policies=[scale])
+
+                for category in BaselSimulationMonitor.BaselRecordCategory:
+                    np.testing.assert_array_equal(stacked.record(category)[:, k], single.record(category)[:, 0],
+                        err_msg="{} {}".format(config, category.name))
+
+        unstacked = runProfile({})
+        for category in BaselSimulationMonitor.BaselRecordCategory:
+            np.testing.assert_array_equal(runProfile({}, policies=[1]).record(category)[:, 0], unstacked.record(category))
+
+    def test_event_log(self):
+        categories = BaselSimulationMonitor.BaselRecordCategory
+        configs = [{}, {"use_workspace": True}] + ([{"use_kernel": True}] if NUMBA_AVAILABLE else [])
+
+        for config in configs:
+            for policies in (None, [1, 0.6]):
+                expected = runProfile(config, years=3, policies=policies)
+                monitor = runProfile(config, {"event_log": True, "event_log_capacity": 4}, years=3, policies=policies)
+                self.assertGreater(len(monitor.event_log), 4)
+
+                # the state categories only hold two rows, their dense records being rebuilt from the log
+                for category in BaselSimulationMonitor.EVENT_CATEGORIES + (categories.KMULTIPLIERS_VALUE, ):
+                    self.assertNotIn(category, monitor.record())
+
+                for category in categories:
+                    np.testing.assert_array_equal(expected.record(category), monitor.record(category),
+                        err_msg="{} {}".format(config, category.name))
+
+        monitor = runProfile({}, {"event_log": True}, years=3)
+        bankruptcy = monitor.record(categories.BANKRUPTCY)
+
+        for path in range(bankruptcy.shape[-1]):
+            bankruptcy_time = monitor.bankruptcyTime(path)
+
+            if bankruptcy[-1, path] == 0:
+                self.assertIsNone(bankruptcy_time)
+            else:
+                self.assertEqual(bankruptcy_time[0], np.argmax(bankruptcy[:, path]))
+                self.assertEqual(len(monitor.event_log.events(SimulationEventType.BANKRUPTCY, path)), 1)
+
+        self.assertIsNone(runProfile({}).event_log)
+
+    def test_selective_recording(self):
+        categories = BaselSimulationMonitor.BaselRecordCategory
+        expected = runProfile({})
+        configs = [{}, {"use_workspace": True}] + ([{"use_kernel": True}] if NUMBA_AVAILABLE else [])
+
+        for config in configs:
+            monitor = runProfile(config, {"categories": ["RETURN_ANNUAL", categories.DISCLOSURE_ANNUAL_MEAN]})
+            recorded = set(categories) - {categories.ACTION, categories.MRC_DAILY, categories.MRC_ANNUAL, categories.RETURN_EFFECTIVE_ANNUAL}
+
+            self.assertEqual(monitor.recorded_categories, recorded)
+            self.assertEqual(set(monitor.categories()) & set(categories), recorded)
+
+            for category in recorded:
+                np.testing.assert_array_equal(expected.record(category), monitor.record(category), err_msg="{} {}".format(config, category.name))
+
+            self.assertLess(monitor.pathBytes(), expected.pathBytes())
+
+        with self.assertRaises(ValueError):
+            runProfile({}, {"categories": ["UNKNOWN"]})
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from simulator.returns.returns_historical import HistoricalReturnSource
+import numpy as np
+
+
+class TestReturns(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        # returns equal to their day's index, so samples reveal the sampled days
+        self._path = os.path.join(self._directory.name, "returns.bin")
+        np.arange(1000, dtype=np.float64).tofile(self._path)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_moving_block(self):
+        source = HistoricalReturnSource({"path": self._path, "method": "moving", "block_length": 5})
+        np.random.seed(1)
+
+        returns, state = source.sample(12, 40)
+        steps = np.diff(returns, axis=0) % 1000
+
+        self.assertEqual(returns.shape, (12, 40))
+        self.assertTrue(np.all(steps[[0, 1, 2, 3, 5, 6, 7, 8, 10]] == 1))
+
+        # the blocks carry over onto the following call
+        following, _ = source.sample(3, 40, state)
+        np.testing.assert_array_equal((following[:3] - returns[-1]) % 1000, np.tile([[1], [2], [3]], 40))
+
+    def test_stationary_bootstrap(self):
+        source = HistoricalReturnSource({"path": self._path, "block_length": 20})
+        np.random.seed(2)
+
+        returns, _ = source.sample(250, 400)
+        renewals = (np.diff(returns, axis=0) % 1000 != 1).mean()
+
+        self.assertAlmostEqual(renewals, 1 / 20, delta=0.005)
+
+    def test_subset(self):
+        np.save(os.path.join(self._directory.name, "returns.npy"), np.stack([np.arange(1000.0), -np.arange(1000.0)], axis=1))
+        source = HistoricalReturnSource({"path": os.path.join(self._directory.name, "returns.npy"), "column": 1, "scale": 2})
+
+        np.random.seed(3)
+        expected, expected_state = source.sample(30, 50)
+        expected, _ = source.sample(30, 50, expected_state)
+
+        np.random.seed(3)
+        returns, state = source.sample(30, 50, subset=slice(10, 25))
+        returns, _ = source.sample(30, 50, state, subset=slice(10, 25))
+
+        np.testing.assert_array_equal(expected[:, 10:25], returns)
+        self.assertTrue(np.all(returns <= 0))
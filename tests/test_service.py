@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from simulator.runner import loadPolicies, runSimulation
+from simulator.service import SimulationService, connectService, decodeRecords, submitJob
+import numpy as np
+
+
+def createJob(years: int = 2, paths: int = 20, seed: int = 5) -> dict:
+    return {
+        "simulation_number": years,
+        "simulation_years": paths,
+        "day_order": "D",
+        "returns_distribution": {"mean": 0, "std": 1},
+        "seed": seed,
+        "profiles": {"basel": {"policy": "policy.npy"}}}
+
+
+class TestService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        np.save(os.path.join(self._directory.name, "policy.npy"), np.random.RandomState(3).uniform(0.05, 1.5, (8, 12, 250)))
+
+        self._output_dir = os.path.join(self._directory.name, "records")
+        os.makedirs(self._output_dir)
+
+        self._service = SimulationService({"socket": os.path.join(self._directory.name, "service.sock"), "workers": 1,
+            "preload": [os.path.join(self._directory.name, "policy.npy")], "output_dir": self._output_dir})
+        await self._service.startService()
+
+    async def asyncTearDown(self):
+        await self._service.stopService()
+        self._directory.cleanup()
+
+    async def collectEvents(self, job: dict, priority: int = 0, started: list = None, output: str = None) -> list:
+        events = []
+
+        async for event in submitJob(self._service.address, job, priority, base_dir=self._directory.name, output=output):
+            events.append(event)
+
+            if started is not None and event["event"] == "started":
+                started.append(priority)
+
+        return events
+
+    async def test_job_results(self):
+        job = createJob()
+        events = await self.collectEvents(job)
+
+        self.assertEqual([event["event"] for event in events], ["queued", "started", "progress", "progress", "result"])
+        self.assertEqual((events[-2]["done"], events[-2]["total"]), (40, 40))
+
+        expected = runSimulation(job, loadPolicies(job, self._directory.name))
+        records = decodeRecords(events[-1])
+
+        self.assertEqual(set(expected), set(records))
+
+        for key, record in expected.items():
+            np.testing.assert_array_equal(record, records[key], err_msg=key)
+
+    async def test_priorities(self):
+        started = []
+        events = submitJob(self._service.address, createJob(years=4, paths=300), base_dir=self._directory.name)
+
+        # hold the single worker busy, then queue a low and a high priority job
+        async for event in events:
+            if event["event"] == "started":
+                break
+
+        low = asyncio.create_task(self.collectEvents(createJob(), 0, started))
+        await asyncio.sleep(0.05)
+        high = asyncio.create_task(self.collectEvents(createJob(), 5, started))
+
+        async for event in events:
+            pass
+
+        await asyncio.gather(low, high)
+
+        self.assertEqual(started, [5, 0])
+        self.assertEqual(low.result()[-1]["event"], "result")
+
+    async def test_invalid_requests(self):
+        for priority, output in (("high", None), (1.5, None), (0, "../records.npz"), (0, "/tmp/records.npz")):
+            events = await self.collectEvents(createJob(), priority, output=output)
+            self.assertEqual([event["event"] for event in events], ["error"], (priority, output))
+
+        self.assertEqual(self._service._jobs, {})
+
+        events = await self.collectEvents(createJob(), output="records.npz")
+        self.assertEqual(events[-1]["output"], os.path.join(os.path.realpath(self._output_dir), "records.npz"))
+        self.assertEqual(set(decodeRecords(events[-1])), set(runSimulation(createJob(), loadPolicies(createJob(), self._directory.name))))
+
+    async def test_broken_pool(self):
+        events = submitJob(self._service.address, createJob(years=4, paths=300), base_dir=self._directory.name)
+        progress_queue = self._service._progress_queue
+
+        async for event in events:
+            if event["event"] == "started":
+                break
+
+        # a worker dying mid-job fails its job, and the pool is restarted with a new progress queue
+        for process in self._service._pool._processes.values():
+            process.kill()
+
+        self.assertEqual([event["event"] async for event in events][-1], "failed")
+        self.assertIsNot(self._service._progress_queue, progress_queue)
+
+        events = await self.collectEvents(createJob())
+        self.assertEqual([event["event"] for event in events], ["queued", "started", "progress", "progress", "result"])
+
+    async def test_disconnect(self):
+        events = submitJob(self._service.address, createJob(years=4, paths=300), base_dir=self._directory.name)
+
+        async for event in events:
+            if event["event"] == "started":
+                break
+
+        # a job queued on a connection closed before it runs is dropped
+        reader, writer = await connectService(self._service.address)
+        writer.write(json.dumps({"op": "submit", "job": createJob(), "base_dir": self._directory.name}).encode() + b"\n")
+        await writer.drain()
+        self.assertEqual(json.loads(await reader.readline())["event"], "queued")
+        writer.close()
+        await writer.wait_closed()
+
+        async for event in events:
+            pass
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(self._service._jobs, {})
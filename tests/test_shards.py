@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+from simulator.runner import buildSimulation, resolvePaths, runSimulation
+from simulator.shards import claimShard, mergeMonitors, mergeShards, reclaimShards, runShard, runWorker, shardStatus, submitShards
+from simulator.monitor.monitor_basel import BaselSimulationMonitor
+import numpy as np
+
+
+def createJob(years: int = 2, paths: int = 50) -> dict:
+    return {
+        "simulation_number": years,
+        "simulation_years": paths,
+        "day_order": "D",
+        "returns_distribution": {"mean": 0, "std": 1},
+        "importance_sampling": {"scale": 1.1},
+        "seed": 9,
+        "profiles": {"basel": {"policy": "policy.npy"}}}
+
+def createPolicies() -> dict:
+    return {"basel": np.random.RandomState(3).uniform(0.05, 1.5, (8, 12, 250))}
+
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._queue = os.path.join(self._directory.name, "queue")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def assertSameRecords(self, expected: dict, records: dict):
+        self.assertEqual(set(expected), set(records))
+
+        for key, record in expected.items():
+            np.testing.assert_array_equal(record, records[key], err_msg=key)
+
+    def test_local_workers(self):
+        self.assertEqual(submitShards(self._queue, createJob(), createPolicies(), 12), 5)
+
+        context = multiprocessing.get_context("spawn")
+        workers = [context.Process(target=runWorker, args=(self._queue, "worker{}".format(worker)), kwargs={"poll": 0.1})
+            for worker in range(3)]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join(120)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(shardStatus(self._queue), {"pending": 0, "claimed": 0, "done": 5})
+        # shards draw from streams of shard_paths paths by default
+        self.assertSameRecords(runSimulation(dict(createJob(), stream_block_paths=12), createPolicies()), mergeShards(self._queue))
+
+        monitor = mergeMonitors(self._queue)["basel"]
+        rc_bankruptcy = BaselSimulationMonitor.BaselRecordCategory.BANKRUPTCY
+
+        self.assertEqual(monitor.path_count, 50)
+        self.assertEqual(monitor.weighted_rate(rc_bankruptcy)[0].shape, (2, ))
+
+    def test_reclaim_dead_worker(self):
+        submitShards(self._queue, createJob(), createPolicies(), 25)
+
+        # a worker claims a shard and dies
+        descriptor = claimShard(self._queue, "dead")
+        claimed_path = os.path.join(self._queue, "claimed", "{:06d}.json".format(descriptor["shard"]))
+        os.utime(claimed_path, (time.time() - 10, time.time() - 10))
+
+        self.assertEqual(runWorker(self._queue, lease=5, poll=0.1), 2)
+        self.assertSameRecords(runSimulation(dict(createJob(), stream_block_paths=25), createPolicies()), mergeShards(self._queue))
+
+    def test_reclaimed_slow_worker(self):
+        submitShards(self._queue, createJob(), createPolicies(), 50)
+
+        # a slow worker's claim is reclaimed, then claimed by another worker
+        slow = claimShard(self._queue, "slow")
+        claimed_path = os.path.join(self._queue, "claimed", "{:06d}.json".format(slow["shard"]))
+        os.utime(claimed_path, (time.time() - 10, time.time() - 10))
+        self.assertEqual(reclaimShards(self._queue, 5), [slow["shard"]])
+        fast = claimShard(self._queue, "fast")
+
+        # the slow worker neither publishes the shard nor releases the new claim
+        self.assertFalse(runShard(self._queue, slow))
+        self.assertEqual(shardStatus(self._queue), {"pending": 0, "claimed": 1, "done": 0})
+
+        self.assertTrue(runShard(self._queue, fast))
+        self.assertEqual(shardStatus(self._queue), {"pending": 0, "claimed": 0, "done": 1})
+
+    def test_shard_width(self):
+        # a shard's monitors only span its own paths
+        simulator, monitors = buildSimulation(createJob(), createPolicies(), slice(12, 24))
+        rc_exceedences = BaselSimulationMonitor.BaselRecordCategory.EXCEEDENCES
+
+        self.assertEqual(monitors["basel"].path_count, 12)
+        self.assertEqual(monitors["basel"].record(rc_exceedences).shape, (2, 12))
+
+    def test_returns_file(self):
+        # the returns file is resolved against base_dir and copied onto the queue
+        np.save(os.path.join(self._directory.name, "returns.npy"), np.random.RandomState(5).standard_t(4, 2000))
+        config = dict(createJob(), importance_sampling=None, returns_source={"path": "returns.npy"})
+
+        submitShards(self._queue, config, createPolicies(), 25, self._directory.name)
+
+        self.assertTrue(os.path.exists(os.path.join(self._queue, "returns.npy")))
+        self.assertEqual(runWorker(self._queue, poll=0.1), 2)
+
+        expected_config = resolvePaths(dict(config, stream_block_paths=25), self._directory.name)
+        self.assertSameRecords(runSimulation(expected_config, createPolicies()), mergeShards(self._queue))
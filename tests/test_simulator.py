@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+
+from simulator.distribution.distribution_discrete import DiscreteSimulationDistribution
+from simulator.monitor.monitor_basel import BaselSimulationMonitor
+from simulator.profile.profile_basel import BaselSimulationProfile
+from simulator.simulator import MonteCarloSimulator
+from simulator.streams import PathRandomStreams
+import numpy as np
+
+
+def createSimulator(config: dict = {}, years: int = 2, paths: int = 50, profiles: int = 1, records_config: dict = {},
+        profile_config: dict = {}) -> MonteCarloSimulator:
+    simulator = MonteCarloSimulator(dict({
+        "simulation_number": years,
+        "simulation_years": paths,
+        "day_order": "D",
+        "returns_distribution": {"mean": 0, "std": 1},
+        "importance_sampling": {"scale": 1.1}}, **config))
+
+    for profile in range(profiles):
+        table = np.random.RandomState(3 + profile).uniform(0.05, 1.5, (8, 12, 250))
+        monitor = BaselSimulationMonitor({
+            "default_records": {"record_shape": (1, )},
+            "basel_records": dict(records_config, record_shape=(years, paths), daily_disclosure_record_shape=(250, paths))})
+        simulator.createAndAddSimulationProfile("basel" if profile == 0 else "basel{}".format(profile), BaselSimulationProfile,
+            DiscreteSimulationDistribution({"distribution_function": table}), monitor, profile_config)
+
+    return simulator
+
+def simulate(simulator: MonteCarloSimulator, seed: int = 11, profile_name: str = "basel") -> BaselSimulationMonitor:
+    np.random.seed(seed)
+    simulator.startSimulation()
+
+    return simulator.removeSimulationProfile(profile_name).monitor
+
+
+class TestSimulator(unittest.TestCase):
+    def test_chunked_simulation(self):
+        # chunks of 16 paths span whole 8 path stream blocks, smaller ones span partial blocks
+        expected = simulate(createSimulator({"stream_block_paths": 8}))
+        budget = 20 * createSimulator()._simulation_profiles["basel"].pathBytes()
+
+        with tempfile.TemporaryDirectory() as directory:
+            for config in ({"memory_budget": budget + 50 * expected.pathBytes()},
+                           {"memory_budget": budget, "chunk_directory": directory},
+                           {"memory_budget": budget // 4, "chunk_directory": directory}):
+                simulator = createSimulator(dict(config, stream_block_paths=8))
+                self.assertLess(simulator._chunkPaths(), 50)
+
+                monitor = simulate(simulator)
+
+                for category in list(BaselSimulationMonitor.BaselRecordCategory) + [BaselSimulationMonitor.RecordBaseCategory.LOG_LIKELIHOOD_RATIO]:
+                    np.testing.assert_array_equal(expected.record(category), monitor.record(category), err_msg=category.name)
+
+    def test_chunked_event_log(self):
+        categories = BaselSimulationMonitor.BaselRecordCategory
+        records_config = {"event_log": True}
+        # chunked simulations draw from streams of MonteCarloSimulator.STREAM_BLOCK_PATHS paths by default
+        expected = simulate(createSimulator({"stream_block_paths": MonteCarloSimulator.STREAM_BLOCK_PATHS}, records_config=records_config))
+        budget = 20 * createSimulator()._simulation_profiles["basel"].pathBytes()
+        monitor = simulate(createSimulator({"memory_budget": budget + 50 * expected.pathBytes()}, records_config=records_config))
+
+        order = ("year", "day", "event", "path")
+        np.testing.assert_array_equal(np.sort(expected.event_log.events(), order=order), np.sort(monitor.event_log.events(), order=order))
+
+        for category in (categories.EXCEEDENCES, categories.BANKRUPTCY, categories.KMULTIPLIERS_INDECES):
+            np.testing.assert_array_equal(expected.record(category), monitor.eventRecord(category), err_msg=category.name)
+
+    def test_path_streams(self):
+        streams = PathRandomStreams(7, 8)
+        streams.select(slice(0, 50))
+        expected = streams.random(3)
+
+        # a range only draws from its own blocks, a day at a time or a block of days at once
+        streams.select(slice(13, 29))
+        np.testing.assert_array_equal(expected[:, 13:29], np.stack([streams.random() for _ in range(3)]))
+        self.assertEqual([block for block, _, _, _ in streams.blocks], [1, 2, 3])
+
+        streams.select(slice(16, 32))
+        np.testing.assert_array_equal(expected[:, 16:32], streams.random(3))
+
+    def test_historical_returns(self):
+        categories = BaselSimulationMonitor.BaselRecordCategory
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "returns.npy")
+            np.save(path, np.random.RandomState(5).standard_t(4, 2000))
+            config = {"importance_sampling": None, "returns_source": {"path": path, "block_length": 5}, "stream_block_paths": 8}
+
+            simulator = createSimulator(config)
+            sample = simulator._returns_source.sample
+            sampled_days = []
+            simulator._returns_source.sample = lambda days, *args: sampled_days.append(days) or sample(days, *args)
+
+            expected = simulate(simulator)
+            # a year's returns are sampled at once, per stream block (of 8 paths)
+            self.assertEqual(sampled_days, [250] * 2 * 7)
+
+            budget = 20 * createSimulator()._simulation_profiles["basel"].pathBytes()
+            monitor = simulate(createSimulator(dict(config, memory_budget=budget + 50 * expected.pathBytes())))
+
+            for category in categories:
+                np.testing.assert_array_equal(expected.record(category), monitor.record(category), err_msg=category.name)
+
+            self.assertFalse(np.array_equal(expected.record(categories.EXCEEDENCES), simulate(createSimulator()).record(categories.EXCEEDENCES)))
+
+    def test_snapshot_fork(self):
+        categories = list(BaselSimulationMonitor.BaselRecordCategory) + [BaselSimulationMonitor.RecordBaseCategory.LOG_LIKELIHOOD_RATIO]
+        records_config = {"event_log": True}
+        expected = simulate(createSimulator(years=4, records_config=records_config))
+
+        paused = createSimulator(years=4, records_config=records_config)
+        np.random.seed(11)
+        paused.startSimulation(stop_year=2)
+
+        with paused.snapshot() as snapshot:
+            resumed = createSimulator(years=4, records_config=records_config)
+            resumed.restoreSnapshot(snapshot)
+            resumed.startSimulation()
+            monitor = resumed.removeSimulationProfile("basel").monitor
+
+            for category in categories:
+                np.testing.assert_array_equal(expected.record(category), monitor.record(category), err_msg=category.name)
+
+            np.testing.assert_array_equal(expected.event_log.events(), monitor.event_log.events())
+
+            # a scenario forked with another reported value shares the snapshot's years only
+            forked = createSimulator(years=4, records_config=records_config, profile_config={"max_report_value": 0})
+            forked.restoreSnapshot(snapshot)
+            forked.startSimulation()
+            disclosure = forked.removeSimulationProfile("basel").monitor.record(BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE_ANNUAL_MEAN)
+            expected_disclosure = expected.record(BaselSimulationMonitor.BaselRecordCategory.DISCLOSURE_ANNUAL_MEAN)
+
+            np.testing.assert_array_equal(expected_disclosure[:2], disclosure[:2])
+            self.assertFalse(np.array_equal(expected_disclosure[2:], disclosure[2:]))
+
+        with self.assertRaises(ValueError):
+            createSimulator().snapshot()
+
+    def test_importance_weights_many_years(self):
+        categories = BaselSimulationMonitor.BaselRecordCategory
+        policy = DiscreteSimulationDistribution({"distribution_function": np.full((8, 12, 250), 0.9)})
+
+        def simulatePolicy(config: dict, paths: int, seed: int) -> BaselSimulationMonitor:
+            simulator = createSimulator(config, years=4, paths=paths)
+            simulator._simulation_profiles["basel"].distribution = policy
+            return simulate(simulator, seed)
+
+        # a year's k multipliers follow from the previous year's exceedances, so its weights must
+        # account for every return drawn up to it
+        expected, expected_stderr = simulatePolicy({"importance_sampling": None}, 20000, 5).weighted_mean(categories.KMULTIPLIERS_INDECES)
+        monitor = simulatePolicy({"importance_sampling": {"shift": -0.05}}, 5000, 1)
+        estimate, stderr = monitor.weighted_mean(categories.KMULTIPLIERS_INDECES)
+
+        self.assertFalse(np.allclose(monitor.record(categories.KMULTIPLIERS_INDECES)[1:4].mean(axis=-1), expected[1:4], atol=0.1))
+        self.assertTrue((np.abs(estimate[1:] - expected[1:4]) < 4 * np.sqrt(stderr[1:] ** 2 + expected_stderr[1:4] ** 2)).all())
+
+    def test_threaded_profiles(self):
+        categories = list(BaselSimulationMonitor.BaselRecordCategory) + [BaselSimulationMonitor.RecordBaseCategory.LOG_LIKELIHOOD_RATIO]
+        expected = simulate(createSimulator(profiles=3), profile_name="basel2")
+
+        for config in ({"profile_threads": 3}, {"profile_threads": 2, "thread_block": "year"}):
+            monitor = simulate(createSimulator(config, profiles=3), profile_name="basel2")
+
+            for category in categories:
+                np.testing.assert_array_equal(expected.record(category), monitor.record(category), err_msg=category.name)
+
+    def test_memory_budget_too_small(self):
+        with self.assertRaises(ValueError):
+            simulate(createSimulator({"memory_budget": 1000}))
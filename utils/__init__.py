@@ -1,2 +1,2 @@
 from utils.utils_decorators import inputDecorators
-from utils.utils_distribution import convertToRowMajor
\ No newline at end of file
+from utils.utils_distribution import convertToRowMajor, convertToRowMajorInto
@@ -11,4 +11,29 @@ def convertToRowMajor(observations: np.ndarray, shape: np.ndarray):
         [The shape of the distribution from which to retrieve actions]
     
     '''
-    return np.ravel_multi_index(observations, shape, order='C')
\ No newline at end of file
+    return np.ravel_multi_index(observations, shape, order='C')
+
+def convertToRowMajorInto(observations, shape, out: np.ndarray) -> np.ndarray:
+    '''Converts per-dimension observation components into row-major ordering, in place.
+
+    Equivalent to convertToRowMajor on the stacked components, without allocating intermediate arrays
+    (Horner's scheme over the distribution's dimensions). Indices are not bounds-checked, callers check
+    them against the shape beforehand (see BaselSimulationProfile).
+
+    Parameters
+    ----------
+    observations : Sequence[np.ndarray]
+        [One array (or scalar) per distribution dimension, e.g. (k_indices, exceedances, ttob)]
+    shape : np.ndarray
+        [The shape of the distribution from which to retrieve actions]
+    out : np.ndarray
+        [Integer array receiving the raveled indices]
+
+    '''
+    np.copyto(out, observations[0], casting='unsafe')
+
+    for observation, dim in zip(observations[1:], shape[1:]):
+        np.multiply(out, dim, out=out)
+        np.add(out, observation, out=out, casting='unsafe')
+
+    return out